@@ -0,0 +1,150 @@
+"""
+Description  : Accelerator of divide_polygon, operating on contiguous double buffers
+
+This module is plain typed Python, meant to be compiled with mypyc:
+
+    mypyc _divide_polygon_accel.py
+
+`divide_polygon` only uses it once compiled, falling back to its pure-Python implementation otherwise.
+Polygons are given as coordinates `xs`, `ys` (e.g. `array("d")`), dividing segments are returned flat.
+"""
+
+from math import atan2, cos, pi, sin, sqrt
+from typing import List, Sequence, Tuple
+
+
+def rotated(xs: Sequence[float], ys: Sequence[float], theta: float, start: int) -> Tuple[List[float], List[float]]:
+    """Get coordinates in the coordinate system rotated by `theta`, beginning with the start-th vertex.
+
+    Args:
+        xs (Sequence[float]): first-dimensional coordinates of polygon
+        ys (Sequence[float]): second-dimensional coordinates of polygon
+        theta (float): the angle to rotate
+        start (int): index of vertex to become the first one
+
+    Returns:
+        Tuple[List[float], List[float]]: rotated coordinates
+    """
+    sin_theta, cos_theta = sin(theta), cos(theta)
+    n = len(xs)
+    rxs = [0.0] * n
+    rys = [0.0] * n
+    for k in range(n):
+        i = (start + k) % n
+        rxs[k] = cos_theta * xs[i] + sin_theta * ys[i]
+        rys[k] = -sin_theta * xs[i] + cos_theta * ys[i]
+    return rxs, rys
+
+
+def polygon_area(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """Evaluate area of a polygon using shoelace formula, as `_polygon_area`."""
+    area = 0.0
+    n = len(xs)
+    if n == 0:
+        return area
+    x0 = xs[0]
+    j = n - 1
+    for i in range(n):
+        area += ((xs[j] - x0) + (xs[i] - x0)) * (ys[j] - ys[i])
+        j = i
+    return abs(area / 2.0)
+
+
+def dividing_polygon_segs(xs: Sequence[float], ys: Sequence[float]) -> Tuple[List[float], List[float], List[float]]:
+    """Get segments to divide polygon into multiple trapezoids, as `_dividing_polygon_segs`.
+
+    Returns:
+        Tuple[List[float], List[float], List[float]]: x, bottom y and top y of dividing segments
+    """
+    n = len(xs)
+    t, b = n - 1, 0
+    lt_x, lt_y = xs[t], ys[t]
+    lb_x, lb_y = xs[b], ys[b]
+    seg_xs: List[float] = []
+    seg_bottoms: List[float] = []
+    seg_tops: List[float] = []
+    while b + 1 < t:  # until the chains meet at the rightmost vertices
+        tx, ty = xs[t - 1], ys[t - 1]
+        bx, by = xs[b + 1], ys[b + 1]
+        if tx < bx:
+            x, rt_y = tx, ty
+            rb_y = by if bx == lb_x else lb_y + min(max((x - lb_x) / (bx - lb_x), 0.0), 1.0) * (by - lb_y)
+            t -= 1
+        elif tx > bx:
+            x, rb_y = bx, by
+            rt_y = ty if tx == lt_x else lt_y + min(max((x - lt_x) / (tx - lt_x), 0.0), 1.0) * (ty - lt_y)
+            b += 1
+        else:
+            x, rt_y, rb_y = tx, ty, by
+            t -= 1
+            b += 1
+        if rt_y < rb_y:
+            break
+        if x <= lb_x and rt_y - rb_y < lt_y - lb_y:  # walking down the rightmost side
+            break
+        seg_xs.append(x)
+        seg_bottoms.append(rb_y)
+        seg_tops.append(rt_y)
+        lt_x, lt_y = x, rt_y
+        lb_x, lb_y = x, rb_y
+    return seg_xs, seg_bottoms, seg_tops
+
+
+def divide_polygon_rotated(xs: Sequence[float], ys: Sequence[float], n: int, area: float) -> List[float]:
+    """Divede polygon with lines parallel with its fisrt edge, as `_divide_polygon`.
+
+    Returns:
+        List[float]: x, bottom y and top y of each dividing segment, flat
+    """
+    seg_xs, seg_bottoms, seg_tops = dividing_polygon_segs(xs, ys)
+    bxs = [xs[0]] + seg_xs
+    bottoms = [ys[0]] + seg_bottoms
+    tops = [ys[len(ys) - 1]] + seg_tops
+    cum_areas: List[float] = []
+    total = 0.0
+    for i in range(1, len(bxs)):
+        total += (tops[i - 1] - bottoms[i - 1] + tops[i] - bottoms[i]) * (bxs[i] - bxs[i - 1]) / 2.0
+        cum_areas.append(total)
+
+    res: List[float] = []
+    des_area = area / n
+    i, last = 0, len(cum_areas) - 1
+    for k in range(1, n):
+        target = des_area * k
+        while i < last and cum_areas[i] < target:
+            i += 1
+        prev = cum_areas[i - 1] if i else 0.0
+        trap_area = cum_areas[i] - prev
+        ratio = (target - prev) / trap_area if trap_area > 0.0 else 1.0
+        a = tops[i] - bottoms[i]
+        b = tops[i + 1] - bottoms[i + 1]
+        c = sqrt(max(a * a + ratio * (b - a) * (b + a), 0.0))
+        frac = ratio * (a + b) / (a + c) if a + c > 0.0 else ratio
+        res.append(bxs[i] + frac * (bxs[i + 1] - bxs[i]))
+        res.append(bottoms[i] + frac * (bottoms[i + 1] - bottoms[i]))
+        res.append(tops[i] + frac * (tops[i + 1] - tops[i]))
+    return res
+
+
+def divide_polygon(xs: Sequence[float], ys: Sequence[float], n: int, idx: int) -> List[float]:
+    """Divede polygon with lines parallel with its idx-th edge, as `divide_polygon`.
+
+    Returns:
+        List[float]: bottom x, bottom y, top x and top y of each dividing segment, flat
+    """
+    m = len(xs)
+    prev, cur = (idx - 1) % m, idx % m
+    theta = atan2(ys[prev] - ys[cur], xs[prev] - xs[cur]) - pi / 2.0
+    rxs, rys = rotated(xs, ys, theta, cur)
+    cuts = divide_polygon_rotated(rxs, rys, n, polygon_area(rxs, rys))
+
+    # convert to origin coord
+    sin_theta, cos_theta = sin(theta), cos(theta)
+    res: List[float] = []
+    for k in range(0, len(cuts), 3):
+        x, bottom, top = cuts[k], cuts[k + 1], cuts[k + 2]
+        res.append(cos_theta * x - sin_theta * bottom)
+        res.append(sin_theta * x + cos_theta * bottom)
+        res.append(cos_theta * x - sin_theta * top)
+        res.append(sin_theta * x + cos_theta * top)
+    return res
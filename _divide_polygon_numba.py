@@ -0,0 +1,141 @@
+"""
+Description  : Numba kernels of divide_polygon
+
+The trapezoid sweep and the cut loop as array kernels, JIT-compiled by Numba. Compiled code is
+cached on disk (`cache=True`), so that new worker processes do not pay JIT cost each time.
+This module is only imported by `divide_polygon(..., backend="numba")`.
+"""
+
+from math import atan2, cos, pi, sin, sqrt
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def polygon_area(xs, ys):
+    """Evaluate area of a polygon using shoelace formula, as `_polygon_area`."""
+    area = 0.0
+    n = len(xs)
+    if n == 0:
+        return area
+    x0 = xs[0]
+    j = n - 1
+    for i in range(n):
+        area += ((xs[j] - x0) + (xs[i] - x0)) * (ys[j] - ys[i])
+        j = i
+    return abs(area / 2.0)
+
+
+@njit(cache=True)
+def dividing_polygon_segs(xs, ys):
+    """Get segments to divide polygon into multiple trapezoids, as `_dividing_polygon_segs`.
+
+    Returns:
+        np.ndarray: (M, 3) x, bottom y and top y of dividing segments
+    """
+    n = len(xs)
+    segs = np.empty((n, 3))
+    count = 0
+    t, b = n - 1, 0
+    lt_x, lt_y = xs[t], ys[t]
+    lb_x, lb_y = xs[b], ys[b]
+    while b + 1 < t:  # until the chains meet at the rightmost vertices
+        tx, ty = xs[t - 1], ys[t - 1]
+        bx, by = xs[b + 1], ys[b + 1]
+        if tx < bx:
+            x, rt_y = tx, ty
+            rb_y = by if bx == lb_x else lb_y + min(max((x - lb_x) / (bx - lb_x), 0.0), 1.0) * (by - lb_y)
+            t -= 1
+        elif tx > bx:
+            x, rb_y = bx, by
+            rt_y = ty if tx == lt_x else lt_y + min(max((x - lt_x) / (tx - lt_x), 0.0), 1.0) * (ty - lt_y)
+            b += 1
+        else:
+            x, rt_y, rb_y = tx, ty, by
+            t -= 1
+            b += 1
+        if rt_y < rb_y:
+            break
+        if x <= lb_x and rt_y - rb_y < lt_y - lb_y:  # walking down the rightmost side
+            break
+        segs[count, 0] = x
+        segs[count, 1] = rb_y
+        segs[count, 2] = rt_y
+        count += 1
+        lt_x, lt_y = x, rt_y
+        lb_x, lb_y = x, rb_y
+    return segs[:count]
+
+
+@njit(cache=True)
+def divide_polygon_rotated(xs, ys, n, area):
+    """Divede polygon with lines parallel with its fisrt edge, as `_divide_polygon`.
+
+    Returns:
+        np.ndarray: (n-1, 3) x, bottom y and top y of dividing segments
+    """
+    segs = dividing_polygon_segs(xs, ys)
+    m = len(segs) + 1
+    bounds = np.empty((m, 3))
+    bounds[0, 0], bounds[0, 1], bounds[0, 2] = xs[0], ys[0], ys[len(ys) - 1]
+    bounds[1:] = segs
+    cum_areas = np.empty(m - 1)
+    total = 0.0
+    for i in range(1, m):
+        a = bounds[i - 1, 2] - bounds[i - 1, 1]
+        b = bounds[i, 2] - bounds[i, 1]
+        total += (a + b) * (bounds[i, 0] - bounds[i - 1, 0]) / 2.0
+        cum_areas[i - 1] = total
+
+    res = np.empty((max(n - 1, 0), 3))
+    des_area = area / n
+    i, last = 0, m - 2
+    for k in range(1, n):
+        target = des_area * k
+        while i < last and cum_areas[i] < target:
+            i += 1
+        prev = cum_areas[i - 1] if i else 0.0
+        trap_area = cum_areas[i] - prev
+        ratio = (target - prev) / trap_area if trap_area > 0.0 else 1.0
+        a = bounds[i, 2] - bounds[i, 1]
+        b = bounds[i + 1, 2] - bounds[i + 1, 1]
+        c = sqrt(max(a * a + ratio * (b - a) * (b + a), 0.0))
+        frac = ratio * (a + b) / (a + c) if a + c > 0.0 else ratio
+        for j in range(3):
+            res[k - 1, j] = bounds[i, j] + frac * (bounds[i + 1, j] - bounds[i, j])
+    return res
+
+
+@njit(cache=True)
+def divide_polygon(p, n, idx):
+    """Divede polygon with lines parallel with its idx-th edge, as `divide_polygon`.
+
+    Args:
+        p (np.ndarray): (N, 2) counterclockwise convex polygon
+        n (int): number of parts to divide polygon into.
+        idx (int): index of edge to be paralleled with.
+
+    Returns:
+        np.ndarray: (n-1, 2, 2) dividing segments (bottom, top)
+    """
+    m = len(p)
+    prev, cur = (idx - 1) % m, idx % m
+    theta = atan2(p[prev, 1] - p[cur, 1], p[prev, 0] - p[cur, 0]) - pi / 2.0
+    sin_theta, cos_theta = sin(theta), cos(theta)
+    xs, ys = np.empty(m), np.empty(m)
+    for k in range(m):
+        i = (cur + k) % m
+        xs[k] = cos_theta * p[i, 0] + sin_theta * p[i, 1]
+        ys[k] = -sin_theta * p[i, 0] + cos_theta * p[i, 1]
+    cuts = divide_polygon_rotated(xs, ys, n, polygon_area(xs, ys))
+
+    # convert to origin coord
+    res = np.empty((len(cuts), 2, 2))
+    for k in range(len(cuts)):
+        x = cuts[k, 0]
+        for j in range(2):
+            y = cuts[k, j + 1]
+            res[k, j, 0] = cos_theta * x - sin_theta * y
+            res[k, j, 1] = sin_theta * x + cos_theta * y
+    return res
@@ -0,0 +1,497 @@
+"""
+Description  : Benchmarks of divide_polygon
+
+Usage:
+    python benchmark.py --quick                        # small grid, a few seconds
+    python benchmark.py -o results.json                # full grid, polygons of 4 to 1M vertices
+    python benchmark.py --baseline results.json        # flag regressions against stored results
+    python benchmark.py --stress                       # accuracy and speed of cut solvers on degenerate trapezoids
+    python benchmark.py --parity                       # check the accelerator against pure Python
+    python benchmark.py --area                         # accuracy and speed of area kernels on a huge ring
+    python benchmark.py --float32                      # precision and speed of float32 local frames in batches
+    python benchmark.py --orientations                 # all orientations at once vs edge by edge
+    python benchmark.py --shapely                      # Shapely polygons in and out, bulk vs through points
+    python benchmark.py --calibrate                    # thresholds of the "auto" backend on this machine
+    python benchmark.py --import-time                  # check `import divide_polygon` stays cheap
+"""
+
+import argparse
+import json
+import os
+import platform
+import py_compile
+import random
+import subprocess
+import sys
+import timeit
+from decimal import Decimal, localcontext
+from math import cos, pi, sin, sqrt
+
+import divide_polygon as dp
+
+VERTICES = (4, 100, 10_000, 1_000_000)
+NS = (2, 100, 100_000)
+QUICK_VERTICES = (4, 100, 10_000)
+QUICK_NS = (2, 100)
+IMPORT_BUDGET = 0.03  # seconds
+HEAVY_MODULES = ("numpy", "numba", "matplotlib", "shapely")
+
+
+def regular_polygon(m: int, radius=1000.0) -> dp._Polygon:
+    """Counterclockwise regular polygon with `m` vertices."""
+    return [dp.Point(radius * cos(2 * pi * i / m), radius * sin(2 * pi * i / m)) for i in range(m)]
+
+
+def random_convex_polygon(m: int, rnd: random.Random, radius=1000.0) -> dp._Polygon:
+    """Counterclockwise convex polygon with `m` vertices at random angles on a circle."""
+    angles = sorted(rnd.uniform(0.0, 2 * pi) for _ in range(m))
+    return [dp.Point(radius * cos(a), radius * sin(a)) for a in angles]
+
+
+def measure(func, min_time=0.2, repeat=3) -> float:
+    """Best time of one call to `func`, in seconds."""
+    timer = timeit.Timer(func)
+    number, elapsed = 1, timer.timeit(1)
+    if elapsed < min_time:
+        number = max(1, int(min_time / max(elapsed, 1e-9)))
+    times = [elapsed] if number == 1 else []
+    times += timer.repeat(repeat=repeat - len(times), number=number)
+    return min(times) / number
+
+
+def cases(vertices, ns):
+    """Yield (name, function to time) of each benchmark."""
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    try:
+        import numba
+    except ImportError:
+        numba = None
+
+    left = (dp.Point(0.0, 0.0), dp.Point(0.0, 1.0))
+    right = (dp.Point(1.0, -0.5), dp.Point(1.0, 2.0))
+    yield "_sep_trapeziod", lambda: dp._sep_trapeziod(left, right, 0.4)
+
+    for m in vertices:
+        poly = regular_polygon(m)
+        # polygon with its first edge parallel with y axis, as `_divide_polygon` expects
+        p = dp._rotated(poly, dp._edge_angle(poly, 0))
+        yield f"_rotate_coord[V={m}]", lambda q=dp._rotated(poly, 0.0): dp._rotate_coord(q, 0.1)
+        yield f"_polygon_area[V={m}]", lambda p=p: dp._polygon_area(p)
+        yield f"_dividing_polygon_segs[V={m}]", lambda p=p: dp._dividing_polygon_segs(p)
+        if np is not None:
+            arr, p_arr = np.array(poly), np.array(p)
+            yield f"_rotate_coord[array,V={m}]", lambda q=arr.copy(): dp._rotate_coord(q, 0.1)
+            yield f"_polygon_area[array,V={m}]", lambda p=p_arr: dp._polygon_area(p)
+            yield f"_dividing_polygon_segs[array,V={m}]", lambda p=p_arr: dp._dividing_polygon_segs(p)
+        for n in ns:
+            yield f"divide_polygon[V={m},n={n}]", lambda poly=poly, n=n: dp.divide_polygon(poly, n, 0)
+            if np is not None:
+                yield f"divide_polygon[array,V={m},n={n}]", lambda arr=arr, n=n: dp.divide_polygon(arr, n, 0)
+            if numba is not None:
+                yield f"divide_polygon[numba,V={m},n={n}]", lambda arr=arr, n=n: dp.divide_polygon(
+                    arr, n, 0, backend="numba"
+                )
+
+
+def legacy_sep_fraction(a: float, b: float, ratio: float) -> float:
+    """Fraction of width at which the former `_sep_trapeziod` divided a trapezoid of heights a, b."""
+    area = (a + b) / 2.0
+    des_area = ratio * area
+    if abs(a - b) <= 1e-8:
+        lmd = des_area / (area - des_area)
+    else:
+        c = sqrt(a ** 2 + ratio * (b ** 2 - a ** 2))
+        lmd = (c - a) / (b - c)
+    return lmd / (1 + lmd)
+
+
+def degenerate_trapezoids():
+    """(a, b, ratio) of trapezoids with (nearly) parallel or vanishing sides."""
+    for a in (1e-6, 1.0, 1e3):
+        for rel in (0.0, 1e-12, 1e-10, 1e-9, 5e-9, 2e-8, 1e-6, 1e-3):
+            for ratio in (1e-6, 1e-3, 0.3, 0.5, 0.999):
+                yield a, a * (1.0 + rel), ratio
+                yield a * (1.0 + rel), a, ratio
+    for ratio in (1e-6, 0.5, 0.999):
+        yield 0.0, 1.0, ratio
+        yield 1.0, 0.0, ratio
+
+
+def area_error(a: float, b: float, ratio: float, t: float) -> float:
+    """Relative error of the area on the left of fraction `t` of the width, evaluated exactly."""
+    with localcontext() as ctx:
+        ctx.prec = 60
+        a, b, ratio, t = Decimal(a), Decimal(b), Decimal(ratio), Decimal(t)
+        des_area = ratio * (a + b) / 2
+        area = t * (2 * a + (b - a) * t) / 2
+        return float(abs(area - des_area) / des_area)
+
+
+def stress() -> dict:
+    """Compare the accuracy and speed of the cut solvers on degenerate trapezoids."""
+    cases = list(degenerate_trapezoids())
+    solvers = {"legacy": legacy_sep_fraction, "_sep_fraction": dp._sep_fraction}
+    report = {}
+    for name, solver in solvers.items():
+        errors = []
+        for a, b, ratio in cases:
+            try:
+                errors.append(area_error(a, b, ratio, solver(a, b, ratio)))
+            except (ZeroDivisionError, ValueError):
+                errors.append(float("inf"))
+        errors.sort()
+        seconds = measure(lambda: [solver(a, b, ratio) for a, b, ratio in cases]) / len(cases)
+        report[name] = {"max_error": errors[-1], "median_error": errors[len(errors) // 2], "seconds": seconds}
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+    else:
+        a, b, ratio = (np.array(c) for c in zip(*cases))
+        t = dp._sep_trapezoids(a, b, ratio)
+        errors = sorted(area_error(*case, float(ti)) for case, ti in zip(cases, t))
+        seconds = measure(lambda: dp._sep_trapezoids(a, b, ratio)) / len(cases)
+        report["_sep_trapezoids"] = {
+            "max_error": errors[-1],
+            "median_error": errors[len(errors) // 2],
+            "seconds": seconds,
+        }
+    return report
+
+
+def legacy_polygon_area(p) -> float:
+    """Area of a polygon as the former `_polygon_area` evaluated it, without re-centering."""
+    if not isinstance(p, list):
+        import numpy as np
+
+        x, y = p[:, 0], p[:, 1]
+        return abs(float(np.dot(np.roll(x, 1) + x, np.roll(y, 1) - y)) / 2.0)
+    area = 0.0
+    j = len(p) - 1
+    for i in range(len(p)):
+        area += (p[j].x + p[i].x) * (p[j].y - p[i].y)
+        j = i
+    return abs(area / 2.0)
+
+
+def exact_polygon_area(p: dp._Polygon) -> Decimal:
+    """Area of a polygon evaluated exactly."""
+    with localcontext() as ctx:
+        ctx.prec = 80
+        xs, ys = [Decimal(q.x) for q in p], [Decimal(q.y) for q in p]
+        return abs(sum((xs[i - 1] + xs[i]) * (ys[i - 1] - ys[i]) for i in range(len(p))) / 2)
+
+
+def area_accuracy(m=1_000_000, radius=2000.0, origin=(4.5e6, 5.3e6)) -> dict:
+    """Compare the accuracy and speed of area kernels on a ring far from the origin, as in projected coordinates."""
+    rnd = random.Random(0)
+    poly = [dp.Point(q.x + origin[0], q.y + origin[1]) for q in random_convex_polygon(m, rnd, radius)]
+    exact = exact_polygon_area(poly)
+    inputs = {"points": poly}
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+    else:
+        inputs["array"] = np.array([(q.x, q.y) for q in poly])
+    report = {}
+    for kind, p in inputs.items():
+        kernels = {
+            "legacy": lambda p=p: legacy_polygon_area(p),
+            "_polygon_area": lambda p=p: dp._polygon_area(p),
+            "_polygon_area[compensated]": lambda p=p: dp._polygon_area(p, compensated=True),
+        }
+        for name, kernel in kernels.items():
+            with localcontext() as ctx:
+                ctx.prec = 80
+                error = float(abs(Decimal(kernel()) - exact) / exact)
+            report[f"{name}[{kind}]"] = {"error": error, "seconds": measure(kernel, repeat=2)}
+    return report
+
+
+def float32_precision(count=20_000, radius=2000.0, origin=(4.5e6, 5.3e6)) -> dict:
+    """Compare batches given as float32 offsets from float64 origins (`dp.local_frame`) with float64 batches.
+
+    Polygons are far from the origin, as in projected coordinates. Errors are the largest relative difference
+    of areas of polygons, and the median and largest distance between dividing segments relative to the radius:
+    the largest ones come from short edges to be paralleled with, whose direction float32 rounds the most.
+    """
+    import numpy as np
+
+    rnd = random.Random(0)
+    polys = []
+    for _ in range(count):
+        x0, y0 = origin[0] + rnd.uniform(-1e5, 1e5), origin[1] + rnd.uniform(-1e5, 1e5)
+        polys.append([(q.x + x0, q.y + y0) for q in random_convex_polygon(rnd.randint(3, 200), rnd, radius)])
+    offsets = np.concatenate(([0], np.cumsum([len(p) for p in polys])))
+    coords = np.array([q for p in polys for q in p])
+    local, origins = dp.local_frame(coords, offsets)
+    ns, idxs = 7, 1
+
+    segs, _ = dp.divide_polygons_batch(coords, offsets, ns, idxs)
+    local_segs, _ = dp.divide_polygons_batch(local, offsets, ns, idxs, origins=origins)
+    distances = np.abs(local_segs - segs).max(axis=(1, 2)) / radius
+    area_error = max(
+        abs(dp.polygon_area(local[a:b].astype(float)) / dp.polygon_area(coords[a:b]) - 1.0)
+        for a, b in zip(offsets[:-1], offsets[1:])
+    )
+    return {
+        "area_error": area_error,
+        "segment_error": {"median": float(np.median(distances)), "max": float(distances.max())},
+        "bytes": {"float64": coords.nbytes, "float32": local.nbytes + origins.nbytes},
+        "seconds": {
+            "float64": measure(lambda: dp.divide_polygons_batch(coords, offsets, ns, idxs), repeat=3),
+            "float32": measure(lambda: dp.divide_polygons_batch(local, offsets, ns, idxs, origins=origins), repeat=3),
+        },
+    }
+
+
+def all_orientations(sizes=(100, 1000, 4000), n=4) -> dict:
+    """Time `dp.divide_all_orientations` against `dp.divide_polygon` with each edge in turn, on arrays."""
+    import numpy as np
+
+    res = {}
+    for m in sizes:
+        p = np.array([(q.x, q.y) for q in regular_polygon(m)])
+        res[m] = {
+            "loop": measure(lambda: [dp.divide_polygon(p, n, idx, backend="numpy") for idx in range(m)], repeat=3),
+            "all": measure(lambda: dp.divide_all_orientations(p, n), repeat=3),
+        }
+    return res
+
+
+def shapely_io(count=20_000, radius=1000.0) -> dict:
+    """Time dividing Shapely polygons: through lists of points one by one, and in bulk by `dp.divide_polygon`.
+
+    Half of the polygons are clockwise, as Shapely does not orient them. Requires shapely.
+    """
+    import numpy as np
+    import shapely
+
+    rnd = random.Random(0)
+    polys = []
+    for _ in range(count):
+        p = [(q.x, q.y) for q in random_convex_polygon(rnd.randint(3, 50), rnd, radius)]
+        polys.append(shapely.Polygon(p if rnd.random() < 0.5 else p[::-1]))
+    polys = np.array(polys, dtype=object)
+    n, idx = 7, 1
+
+    def through_points():
+        res = []
+        for poly in polys:
+            ring = poly.exterior
+            coords = list(ring.coords)[:-1] if ring.is_ccw else list(ring.coords)[-2::-1]
+            i = idx if ring.is_ccw else (len(coords) - idx) % len(coords)
+            lines = dp.divide_polygon([dp.Point(x, y) for x, y in coords], n, i)
+            res.append(shapely.MultiLineString([[tuple(bott), tuple(top)] for bott, top in lines]))
+        return res
+
+    return {
+        "points": measure(through_points, repeat=3),
+        "bulk": measure(lambda: dp.divide_polygon(polys, n, idx), repeat=3),
+    }
+
+
+def parity(count=500, radius=1000.0) -> float:
+    """Largest difference between the accelerator, compiled or not, and the pure-Python implementation.
+
+    Differences are relative to the size of polygons, for areas, dividing segments of the sweep and
+    dividing segments of polygons.
+    """
+    from array import array
+
+    import _divide_polygon_accel as accel
+
+    rnd = random.Random(0)
+    worst = 0.0
+    for _ in range(count):
+        m, n = rnd.randint(3, 200), rnd.randint(1, 50)
+        idx = rnd.randrange(m)
+        poly = random_convex_polygon(m, rnd, radius)
+        xs, ys = array("d", [q.x for q in poly]), array("d", [q.y for q in poly])
+        area = dp._polygon_area(poly)
+        worst = max(worst, abs(accel.polygon_area(xs, ys) - area) / area)
+
+        theta = dp._edge_angle(poly, idx)
+        p = dp._rotated(poly, theta)
+        p = p[idx:] + p[:idx]
+        segs = dp._dividing_polygon_segs(p)
+        seg_xs, seg_bottoms, seg_tops = accel.dividing_polygon_segs([q.x for q in p], [q.y for q in p])
+        if len(seg_xs) != len(segs):
+            return float("inf")
+        for (bott, top), x, y_bottom, y_top in zip(segs, seg_xs, seg_bottoms, seg_tops):
+            worst = max(worst, abs(bott.x - x) / radius, abs(bott.y - y_bottom) / radius, abs(top.y - y_top) / radius)
+
+        lines = dp._divide_polygon(p, n)
+        dp._rotate_back(lines, theta)
+        res = accel.divide_polygon(xs, ys, n, idx)
+        if len(res) != 4 * len(lines):
+            return float("inf")
+        expected = [c for line in lines for q in line for c in q]
+        worst = max([worst] + [abs(a - b) / radius for a, b in zip(res, expected)])
+    return worst
+
+
+def crossover(scalar, vectorized, sizes) -> int:
+    """Smallest size at which `vectorized(size)` runs faster than `scalar(size)`, the largest one if none."""
+    for size in sizes:
+        if measure(vectorized(size), min_time=0.05) < measure(scalar(size), min_time=0.05):
+            return size
+    return sizes[-1]
+
+
+def calibrate() -> dict:
+    """Measure `dp.AUTO_THRESHOLDS` on this machine.
+
+    For lists of points and for arrays, thresholds are the numbers of vertices (dividing in 2) and of parts
+    (dividing a square) from which the "numpy" backend beats the scalar one.
+    """
+    import numpy as np
+
+    scalar = "compiled" if "compiled" in dp.available_backends() else "python"
+    vertices = [2 ** k for k in range(2, 17)]
+    ns = [2 ** k for k in range(1, 18)]
+    thresholds = {}
+    for kind, convert in (("points", list), ("array", np.array)):
+        polys = {m: convert(regular_polygon(m)) for m in vertices}
+        square = convert(regular_polygon(4))
+
+        def by_vertices(backend):
+            return lambda m: lambda: dp.divide_polygon(polys[m], 2, 0, backend=backend)
+
+        def by_cuts(backend):
+            return lambda n: lambda: dp.divide_polygon(square, n, 0, backend=backend)
+
+        thresholds[kind] = (
+            crossover(by_vertices(scalar), by_vertices("numpy"), vertices),
+            crossover(by_cuts(scalar), by_cuts("numpy"), ns),
+        )
+    return thresholds
+
+
+def import_time(repeat=7):
+    """Best time of `import divide_polygon` in a fresh interpreter, with heavy modules it imported.
+
+    The module is byte-compiled first, as it would be once installed.
+    """
+    py_compile.compile(dp.__file__, doraise=True)
+    probe = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "import divide_polygon\n"
+        "print(time.perf_counter() - t)\n"
+        f"print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", probe], cwd=cwd, capture_output=True, text=True, check=True)
+        seconds, modules = out.stdout.split("\n")[:2]
+        best, heavy = min(best, float(seconds)), modules.split()
+    return best, heavy
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Get (name, baseline time, time) of benchmarks slower than baseline by more than `tolerance`."""
+    return [
+        (name, baseline[name], t)
+        for name, t in results.items()
+        if name in baseline and t > baseline[name] * (1.0 + tolerance)
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="run a small grid of polygons")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains PATTERN")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of stored results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against baseline")
+    parser.add_argument("--stress", action="store_true", help="only compare cut solvers on degenerate trapezoids")
+    parser.add_argument("--parity", action="store_true", help="only check the accelerator against pure Python")
+    parser.add_argument("--area", action="store_true", help="only compare area kernels on a huge ring")
+    parser.add_argument("--float32", action="store_true", help="only compare float32 local frames with float64")
+    parser.add_argument("--orientations", action="store_true", help="only time divide_all_orientations")
+    parser.add_argument("--shapely", action="store_true", help="only time Shapely polygons in and out")
+    parser.add_argument("--calibrate", action="store_true", help="only measure thresholds of the auto backend")
+    parser.add_argument("--import-time", action="store_true", help="only check the time to import divide_polygon")
+    parser.add_argument(
+        "--import-budget", type=float, default=IMPORT_BUDGET, help="allowed time to import divide_polygon, in seconds"
+    )
+    args = parser.parse_args(argv)
+
+    if args.parity:
+        worst = parity()
+        compiled = "compiled" if dp._accel is not None else "not compiled"
+        print(f"accelerator ({compiled}): largest relative difference {worst:.2e}")
+        return 0 if worst <= 1e-9 else 1
+
+    if args.import_time:
+        seconds, heavy = import_time()
+        print(f"import divide_polygon: {seconds * 1e3:.2f} ms (budget {args.import_budget * 1e3:.2f} ms)")
+        if heavy:
+            print(f"import divide_polygon imported {', '.join(heavy)}")
+        return 0 if seconds <= args.import_budget and not heavy else 1
+
+    if args.area:
+        for name, r in area_accuracy(100_000 if args.quick else 1_000_000).items():
+            print(f"{name:<40} relative error {r['error']:.2e}  {r['seconds'] * 1e3:.2f} ms")
+        return 0
+
+    if args.float32:
+        r = float32_precision(2_000 if args.quick else 20_000)
+        seg = r["segment_error"]
+        print(f"relative error: areas {r['area_error']:.2e}  dividing segments {seg['median']:.2e}", end="")
+        print(f" (max {seg['max']:.2e})")
+        for kind in ("float64", "float32"):
+            print(f"{kind}: {r['bytes'][kind] / 2 ** 20:.1f} MiB  {r['seconds'][kind] * 1e3:.2f} ms")
+        return 0
+
+    if args.orientations:
+        for m, r in all_orientations((100, 1000) if args.quick else (100, 1000, 4000)).items():
+            print(f"{m:>5} vertices: loop {r['loop'] * 1e3:.2f} ms  all at once {r['all'] * 1e3:.2f} ms")
+        return 0
+
+    if args.shapely:
+        for name, seconds in shapely_io(2_000 if args.quick else 20_000).items():
+            print(f"{name:<8} {seconds * 1e3:.2f} ms")
+        return 0
+
+    if args.calibrate:
+        print(f"AUTO_THRESHOLDS = {calibrate()!r}")
+        return 0
+
+    if args.stress:
+        for name, r in stress().items():
+            print(
+                f"{name:<20} max error {r['max_error']:.2e}  median error {r['median_error']:.2e}"
+                f"  {r['seconds'] * 1e9:.1f} ns/trapezoid"
+            )
+        return 0
+
+    vertices, ns = (QUICK_VERTICES, QUICK_NS) if args.quick else (VERTICES, NS)
+    results = {}
+    for name, func in cases(vertices, ns):
+        if args.pattern in name:
+            results[name] = measure(func)
+            print(f"{name:<50} {results[name] * 1e6:>14.2f} us", flush=True)
+
+    if args.output:
+        meta = {"python": sys.version, "platform": platform.platform(), "quick": args.quick}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.2f} us -> {after * 1e6:.2f} us ({after / before - 1.0:+.0%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,31 @@ LastEditTime : 2021-02-28 22:49:15
 Description  : Divide polygon
 """
 
-import copy
-from math import atan2, cos, pi, sin, sqrt
-from typing import List, Tuple
+import os
+import sys
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from itertools import accumulate
+from math import atan2, cos, fsum, pi, sin, sqrt
+from numbers import Real
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, NamedTuple, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class Point:
+    """2D point, compared and hashed by value.
+
+    Points are mutable (`divide_polygon(..., in_place=True)` rotates them), so do not change a point
+    while it is stored in a set or used as a dict key.
+    """
+
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -19,11 +38,50 @@ class Point:
     def __repr__(self):
         return f"({self.x:.2f}, {self.y:.2f})"
 
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy as np
+
+        return np.array((self.x, self.y), dtype=dtype)
+
 
 _Segment = Tuple[Point, Point]
 _Polygon = List[Point]
 
 
+def _load_accel():
+    """Import the accelerator `_divide_polygon_accel` if it was compiled, None otherwise."""
+    from importlib.machinery import EXTENSION_SUFFIXES
+    from importlib.util import find_spec
+
+    spec = find_spec("_divide_polygon_accel")
+    if spec is None or not (spec.origin or "").endswith(tuple(EXTENSION_SUFFIXES)):
+        return None
+    import _divide_polygon_accel
+
+    return _divide_polygon_accel
+
+
+_accel = _load_accel()
+
+
+def _is_ndarray(obj) -> bool:
+    """Check whether `obj` is a numpy array, without importing numpy."""
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(obj, np.ndarray)
+
+
 def _cross_point(p1: Point, p2: Point, x: float) -> Point:
     """Get the point on segment(p1p2) whose first-dimensional coordinate is x
 
@@ -35,26 +93,32 @@ def _cross_point(p1: Point, p2: Point, x: float) -> Point:
     Returns:
         Point: returned point
     """
-    y = (p2.y - p1.y) / (p2.x - p1.x) * (x - p1.x) + p1.y
-    return Point(x, y)
+    if p2.x == p1.x:  # vertical, left behind by rounding: p2 is where the chain goes on from
+        return Point(x, p2.y)
+    # x is between p1 and p2, unless rounding moved vertices in line with a vertical edge: do not extrapolate
+    t = min(max((x - p1.x) / (p2.x - p1.x), 0.0), 1.0)
+    return Point(x, p1.y + t * (p2.y - p1.y))
 
 
-def _dividing_polygon_segs(p: _Polygon) -> List[_Segment]:
+def _dividing_polygon_segs(p: Union[_Polygon, "np.ndarray"]) -> Union[List[_Segment], "np.ndarray"]:
     """Get segments to divide polygon into multiple trapezoids.
 
     Args:
-        p (_Polygon): convex polygon
+        p (Union[_Polygon, np.ndarray]): convex polygon, a list of points or an (N, 2) array
 
     Returns:
-        List[_Segment]: dividing segments
+        Union[List[_Segment], np.ndarray]: dividing segments, an (M, 2, 2) array if `p` is an array
     """
+    if _is_ndarray(p):
+        return _dividing_polygon_segs_array(p)
     t, b = -1, 0
     rt = p[t]  # right top point
     rb = p[b]  # right bottom point
     lt = rt  # left top point
     lb = rb  # left bottom point
     segs = []
-    while True:
+    # the chains meet at the rightmost vertices: stop on indices, crossings are not extrapolated past them
+    while b + 1 < len(p) + t:
         if p[t - 1].x < p[b + 1].x:
             rt = p[t - 1]
             rb = _cross_point(lb, p[b + 1], p[t - 1].x)
@@ -70,29 +134,154 @@ def _dividing_polygon_segs(p: _Polygon) -> List[_Segment]:
             b = b + 1
         if rt.y < rb.y:
             break
+        if rt.x <= lb.x and rt.y - rb.y < lt.y - lb.y:  # walking down the rightmost side
+            break
         segs.append((rb, rt))
         lt = rt
         lb = rb
     return segs
 
 
-def _polygon_area(p: _Polygon) -> float:
+def _dividing_polygon_segs_array(p: "np.ndarray") -> "np.ndarray":
+    """Array version of `_dividing_polygon_segs`.
+
+    Args:
+        p (np.ndarray): (N, 2) convex polygon
+
+    Returns:
+        np.ndarray: (M, 2, 2) dividing segments (bottom, top)
+    """
+    return _dividing_chains_segs_array(*_sweep_chains_array(p))
+
+
+def _sweep_chains_array(p: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Get the bottom chain of a polygon, from p[0] to the first rightmost vertex, and its top chain, from p[-1]
+    backwards to the last rightmost vertex, as views of `p`.
+
+    Vertices of a side parallel with the first edge are all rightmost, although rounding may leave one of them
+    strictly right of the others: the rightmost vertices are taken up to a few ulps of the coordinates.
+    """
+    import numpy as np
+
+    # the sweep is O(V) anyway, and scanning is much cheaper than probing array items one by one
+    tol = _rounding_tolerance(p)
+    return p[: _first_rightmost(p[:, 0], tol) + 1], p[::-1][: _first_rightmost(p[::-1, 0], tol) + 1]
+
+
+def _rounding_tolerance(p: "np.ndarray") -> float:
+    """Get how far rotation may move vertices which are in line in the original coordinates."""
+    import numpy as np
+
+    return 16.0 * np.finfo(float).eps * float(np.abs(p).max(initial=0.0))
+
+
+def _first_rightmost(x: "np.ndarray", tol: float) -> int:
+    """Get index of the first of the rightmost vertices of a chain, up to `tol`."""
+    import numpy as np
+
+    return int(np.argmax(x >= x.max() - tol))
+
+
+def _dividing_chains_segs_array(bottom: "np.ndarray", top: "np.ndarray") -> "np.ndarray":
+    """Get segments to divide the polygon between a bottom and a top chain into multiple trapezoids.
+
+    Every vertex x is an event of the sweep and both chains can be interpolated at all events at once.
+    Events are found by merging both sorted chains.
+
+    Vertices in line with the first edge (or with a vertical edge on the way) do not move the sweep forward,
+    as in the scalar sweep: along each chain, only the last vertex at each x is interpolated, so that e.g. the
+    top of the first edge is the highest of the vertices in line with it, not top[0], but the first one at the
+    final x, where the chain ends.
+
+    Args:
+        bottom (np.ndarray): (K, 2) bottom chain, from left to right
+        top (np.ndarray): (L, 2) top chain, from left to right, top[0] being above bottom[0]
+
+    Returns:
+        np.ndarray: (M, 2, 2) dividing segments (bottom, top)
+    """
+    import numpy as np
+
+    bottom_x, bottom_y = _chain_steps(bottom[:, 0], bottom[:, 1])
+    top_x, top_y = _chain_steps(top[:, 0], top[:, 1])
+    # stable sort is linear on two sorted runs
+    xs = np.sort(np.concatenate((bottom_x[1:], top_x[1:])), kind="stable")
+    if bottom_y[0] != bottom[0, 1] or top_y[0] != top[0, 1]:  # first edge extends beyond its ends
+        xs = np.concatenate(([bottom[0, 0]], xs))
+    xs = xs[np.concatenate(([True], xs[1:] != xs[:-1]))]
+    bottom = np.interp(xs, bottom_x, bottom_y)
+    top = np.interp(xs, top_x, top_y)
+    return np.stack((np.stack((xs, bottom), axis=-1), np.stack((xs, top), axis=-1)), axis=1)
+
+
+def _chain_steps(x: "np.ndarray", y: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Get the points a chain of a convex polygon moves the sweep forward at, for `np.interp`.
+
+    Args:
+        x (np.ndarray): first-dimensional coordinates of the chain, in the order of the sweep
+        y (np.ndarray): second-dimensional coordinates of the chain
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: strictly increasing x, each with the y of the last vertex at it, but the
+            final x with the y of the first vertex at it
+    """
+    import numpy as np
+
+    # rounding may move vertices in line with a vertical edge back a little
+    x = np.maximum.accumulate(x)
+    last = np.concatenate((x[1:] != x[:-1], [True]))
+    final = np.argmax(x == x[-1])
+    last[final:] = False
+    last[final] = True
+    return x[last], y[last]
+
+
+def _shoelace_terms(p: _Polygon) -> Iterator[float]:
+    """Yield terms of the shoelace formula of a list of points, x being re-centered on the first vertex."""
+    x0 = p[0].x
+    x_prev, y_prev = p[-1].x - x0, p[-1].y
+    for q in p:
+        x = q.x - x0
+        yield (x_prev + x) * (y_prev - q.y)
+        x_prev, y_prev = x, q.y
+
+
+def _polygon_area(p: Union[_Polygon, "np.ndarray"], compensated=False) -> float:
     """Evaluate area of a polygon using shoelace formula.
 
+    Coordinates are re-centered on the first vertex, as far from the origin the terms of the formula get much
+    larger than the area and cancel out. Terms of arrays are summed pairwise, those of lists in turn.
+
     Args:
-        p (_Polygon): convex polygon
+        p (Union[_Polygon, np.ndarray]): convex polygon, a list of points or an (N, 2) array
+        compensated (bool, optional): whether to sum terms with `math.fsum`, exactly rounded. Defaults to False.
 
     Returns:
         float: area of polygon
     """
-    area = 0.0
-    n = len(p)
-    j = n - 1
-    for i in range(0, n):
-        area += (p[j].x + p[i].x) * (p[j].y - p[i].y)
-        j = i
+    if len(p) == 0:
+        return 0.0
+    if _is_ndarray(p):
+        import numpy as np
+
+        x, y = p[:, 0] - p[0, 0], p[:, 1]
+        terms = (np.roll(x, 1) + x) * (np.roll(y, 1) - y)
+        return abs((fsum(terms.tolist()) if compensated else float(np.sum(terms))) / 2.0)
+    return abs((fsum if compensated else sum)(_shoelace_terms(p)) / 2.0)
+
+
+def polygon_area(poly: Union[_Polygon, "np.ndarray"], compensated=False) -> float:
+    """Get area of a polygon, as used to divide it.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): polygon, a list of points or an (N, 2) array.
+        compensated (bool, optional): whether to sum terms of the shoelace formula exactly rounded, slower but
+            accurate for huge rings. Defaults to False.
 
-    return abs(area / 2.0)
+    Returns:
+        float: area of polygon
+    """
+    return _polygon_area(poly, compensated)
 
 
 def _trapezoid_area(left: _Segment, right: _Segment) -> float:
@@ -111,10 +300,6 @@ def _trapezoid_area(left: _Segment, right: _Segment) -> float:
     return (a + b) * h / 2.0
 
 
-def _isclose(a, b, precision=1e-8):
-    return abs(a - b) <= precision
-
-
 def _sep_trapeziod(left: _Segment, right: _Segment, des_area: float) -> float:
     """Separate the left part of the specified area from the trapeziod.
 
@@ -130,167 +315,1812 @@ def _sep_trapeziod(left: _Segment, right: _Segment, des_area: float) -> float:
     b = right[1].y - right[0].y
     h = right[0].x - left[0].x
     area = (a + b) * h / 2.0
-    if _isclose(a, b):
-        lmd = des_area / (area - des_area)
-    else:
-        c = sqrt(a ** 2 + (des_area / area) * (b ** 2 - a ** 2))
+    ratio = des_area / area if area > 0.0 else 1.0
+    return left[0].x + _sep_fraction(a, b, ratio) * h
+
+
+def _sep_fraction(a: float, b: float, ratio: float) -> float:
+    """Separate the left part of a fraction of area from a trapezoid given by its heights.
+
+    The height at the cut is c = sqrt(a^2 + ratio * (b^2 - a^2)), and the fraction of width
+    (c - a) / (b - a) is evaluated in its rationalised form ratio * (a + b) / (a + c), which has
+    no cancellation, even for (nearly) parallel sides where it tends to `ratio`.
+
+    Args:
+        a (float): left height of the trapezoid
+        b (float): right height of the trapezoid
+        ratio (float): desired area of the left part, as a fraction of the trapezoid's area
+
+    Returns:
+        float: fraction of the trapezoid's width at which to divide it
+    """
+    c = sqrt(max(a * a + ratio * (b - a) * (b + a), 0.0))
+    return ratio * (a + b) / (a + c) if a + c > 0.0 else ratio
+
+
+def _sep_trapezoids(a: "np.ndarray", b: "np.ndarray", ratio: "np.ndarray") -> "np.ndarray":
+    """Vectorized `_sep_fraction`, solving all cuts in one array operation.
 
-        lmd = (c - a) / (b - c)
-    return (left[0].x + lmd * right[0].x) / (1 + lmd)
+    Args:
+        a (np.ndarray): left heights of the trapezoids
+        b (np.ndarray): right heights of the trapezoids
+        ratio (np.ndarray): desired area of each trapezoid's left part, as a fraction of its area
+
+    Returns:
+        np.ndarray: fractions of the trapezoids' widths at which to divide them
+    """
+    import numpy as np
 
+    c = np.sqrt(np.maximum(a * a + ratio * (b - a) * (b + a), 0.0))
+    den = a + c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0.0, ratio * (a + b) / den, ratio)
 
-def _divide_polygon(p: _Polygon, n: int) -> List[_Segment]:
+
+def _divide_polygon(
+    p: Union[_Polygon, "np.ndarray"], n: int, area: float = None
+) -> Union[List[_Segment], "np.ndarray"]:
     """Divede polygon with lines parallel with its fisrt edge.
 
     Args:
-        p (_Polygon): convex polygon counterclockwise, with the first edge(p[0]p[-1]) parallel with y axis.
+        p (Union[_Polygon, np.ndarray]): convex polygon counterclockwise, with the first edge(p[0]p[-1]) parallel with y axis.
         n (int): number of parts to divide polygon into.
+        area (float, optional): area of polygon, if already known. Defaults to None.
+
+    Returns:
+        Union[List[_Segment], np.ndarray]: dividing segments, an (n-1, 2, 2) array if `p` is an array
+    """
+    if _is_ndarray(p):
+        return _divide_polygon_array(p, n, area)
+    return list(_iter_divide_polygon(p, n, area))
+
+
+def _iter_divide_polygon(p: _Polygon, n: int, area: float = None) -> Iterator[_Segment]:
+    """Generator version of `_divide_polygon`, yielding dividing segments one by one, from left to right."""
+    bounds = [(p[0], p[-1])] + _dividing_polygon_segs(p)
+    cum_areas = _prefix_areas(bounds)
+    des_area = (_polygon_area(p) if area is None else area) / n
+    for k in range(1, n):
+        yield _cut_at_area(bounds, cum_areas, des_area * k)
+
+
+def _prefix_areas(bounds: List[_Segment]) -> List[float]:
+    """Evaluate cumulative areas of the trapezoids between consecutive dividing segments.
+
+    Args:
+        bounds (List[_Segment]): dividing segments, from left to right
+
+    Returns:
+        List[float]: area on the left of each dividing segment but the first one
+    """
+    return list(accumulate(_trapezoid_area(bounds[i - 1], bounds[i]) for i in range(1, len(bounds))))
+
+
+def _cut_at_area(bounds: List[_Segment], cum_areas: List[float], des_area: float) -> _Segment:
+    """Get the dividing segment which separates the left part of the specified area from the polygon.
+
+    The trapezoid to separate is found by binary search in the cumulative areas, in O(log V).
+
+    Args:
+        bounds (List[_Segment]): dividing segments, from left to right
+        cum_areas (List[float]): cumulative areas returned by `_prefix_areas(bounds)`
+        des_area (float): desired area
+
+    Returns:
+        _Segment: dividing segment (bottom, top), made of new points
+    """
+    return _cut_trapezoid(bounds, cum_areas, min(bisect_left(cum_areas, des_area), len(cum_areas) - 1), des_area)
+
+
+def _cuts_at_areas(bounds: List[_Segment], cum_areas: List[float], des_areas: List[float]) -> List[_Segment]:
+    """Get the dividing segments which separate the left parts of the specified areas from the polygon.
+
+    Cumulative areas are walked once along the sorted desired areas, in O(V + k) for k areas.
+
+    Args:
+        bounds (List[_Segment]): dividing segments, from left to right
+        cum_areas (List[float]): cumulative areas returned by `_prefix_areas(bounds)`
+        des_areas (List[float]): desired areas, in ascending order
 
     Returns:
-        List[_Segment]: dividing segments
+        List[_Segment]: dividing segments (bottom, top), made of new points
     """
     res = []
-    segs = _dividing_polygon_segs(p)
-    area = _polygon_area(p)
-    des_area = area / n
-    cur_area = 0.0
-    left_seg = (p[0], p[-1])
-    i = 0
-
-    while i < len(segs) and len(res) < n - 1:
-        right_seg = segs[i]
-        trap_area = _trapezoid_area(left_seg, right_seg)
-        delta_area = des_area - (trap_area + cur_area)
-
-        if delta_area > 0.0:
-            left_seg = right_seg
-            cur_area += trap_area
+    i, last = 0, len(cum_areas) - 1
+    for des_area in des_areas:
+        while i < last and cum_areas[i] < des_area:
             i += 1
+        res.append(_cut_trapezoid(bounds, cum_areas, i, des_area))
+    return res
+
+
+def _cut_trapezoid(bounds: List[_Segment], cum_areas: List[float], i: int, des_area: float) -> _Segment:
+    """Get the dividing segment which separates the left part of the specified area from the polygon, in a trapezoid.
+
+    Args:
+        bounds (List[_Segment]): dividing segments, from left to right
+        cum_areas (List[float]): cumulative areas returned by `_prefix_areas(bounds)`
+        i (int): index of the trapezoid to separate, between bounds[i] and bounds[i+1]
+        des_area (float): desired area
+
+    Returns:
+        _Segment: dividing segment (bottom, top), made of new points
+    """
+    left_seg, right_seg = bounds[i], bounds[i + 1]
+    if des_area == cum_areas[i]:
+        return (Point(right_seg[0].x, right_seg[0].y), Point(right_seg[1].x, right_seg[1].y))
+    x = _sep_trapeziod(left_seg, right_seg, des_area - (cum_areas[i - 1] if i else 0.0))
+    bott = _cross_point(left_seg[0], right_seg[0], x)
+    top = _cross_point(left_seg[1], right_seg[1], x)
+    return (bott, top)
+
+
+def _divide_polygon_array(p: "np.ndarray", n: int, area: float = None) -> "np.ndarray":
+    """Array version of `_divide_polygon`.
+
+    Instead of walking the trapezoids, all cuts are located at once by searching the desired
+    cumulative areas in the cumulative areas of the trapezoids.
+
+    Args:
+        p (np.ndarray): (N, 2) convex polygon counterclockwise, with the first edge(p[0]p[-1]) parallel with y axis.
+        n (int): number of parts to divide polygon into.
+        area (float, optional): area of polygon, if already known. Defaults to None.
+
+    Returns:
+        np.ndarray: (n-1, 2, 2) dividing segments (bottom, top)
+    """
+    bottom, top = _sweep_chains_array(p)
+    return _divide_chains_array(bottom, top, n, _polygon_area(p) if area is None else area)
+
+
+def _divide_chains_array(bottom: "np.ndarray", top: "np.ndarray", n: int, area: float) -> "np.ndarray":
+    """Divide the polygon between a bottom and a top chain (see `_dividing_chains_segs_array`) with vertical lines.
+
+    Returns:
+        np.ndarray: (n-1, 2, 2) dividing segments (bottom, top)
+    """
+    import numpy as np
+
+    bounds = np.concatenate((np.stack((bottom[0], top[0]))[np.newaxis], _dividing_chains_segs_array(bottom, top)))
+    xs = bounds[:, 0, 0]
+    heights = bounds[:, 1, 1] - bounds[:, 0, 1]
+    trap_areas = (heights[:-1] + heights[1:]) * np.diff(xs) / 2.0
+    cum_areas = np.cumsum(trap_areas)
+
+    des_areas = area / n * np.arange(1, n)
+    i = np.minimum(np.searchsorted(cum_areas, des_areas), len(trap_areas) - 1)
+    cur_areas = des_areas - (cum_areas[i] - trap_areas[i])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(trap_areas[i] > 0.0, cur_areas / trap_areas[i], 1.0)
+    t = _sep_trapezoids(heights[i], heights[i + 1], np.clip(ratio, 0.0, 1.0))
+
+    left, right = bounds[i], bounds[i + 1]
+    return left + t[:, np.newaxis, np.newaxis] * (right - left)
+
+
+def _edge_angle(poly: Union[_Polygon, "np.ndarray"], idx: int) -> float:
+    """Get the angle to rotate coordinate system by, to make the idx-th edge of a polygon parallel with y axis.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): polygon, a list of points or an (N, 2) array
+        idx (int): index of edge, edge idx being p[idx-1]p[idx]
+
+    Returns:
+        float: the angle to rotate
+    """
+    (x_prev, y_prev), (x_cur, y_cur) = poly[idx - 1], poly[idx]
+    return atan2(y_prev - y_cur, x_prev - x_cur) - pi / 2.0
+
+
+def _direction_angle(direction: Union[float, Tuple[float, float]]) -> float:
+    """Get the angle from x axis of a direction given as an angle in radians or a vector (dx, dy)."""
+    if isinstance(direction, Real):  # numpy scalars too
+        return float(direction)
+    dx, dy = direction
+    if dx == 0 and dy == 0:
+        raise ValueError("direction must be a non-zero vector")
+    return atan2(dy, dx)
+
+
+def _rise(poly: Union[_Polygon, "np.ndarray"], i: int, j: int, ux: float, uy: float) -> float:
+    """Get how farther the j-th vertex of a polygon is than the i-th one in direction (ux, uy).
+
+    Evaluated on the difference of coordinates, so that it has the sign of the edge even when the direction
+    is almost perpendicular to it.
+    """
+    m = len(poly)
+    (xi, yi), (xj, yj) = poly[i % m], poly[j % m]
+    return (xj - xi) * ux + (yj - yi) * uy
+
+
+def _extreme_vertex(poly: Union[_Polygon, "np.ndarray"], ux: float, uy: float) -> int:
+    """Get index of a vertex of a convex polygon farthest in direction (ux, uy), by binary search in O(log V).
+
+    Projections of the vertices on the direction go up, then down around the polygon, so the search keeps
+    the part of the chain [a, b] where they turn from going up to going down.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array
+        ux (float): first-dimensional component of the direction
+        uy (float): second-dimensional component of the direction
+
+    Returns:
+        int: index of the vertex
+    """
+    m = len(poly)
+
+    def rise(i: int, j: int) -> float:
+        return _rise(poly, i, j, ux, uy)
 
-        elif delta_area < 0.0:
-            x = _sep_trapeziod(left_seg, right_seg, des_area - cur_area)
-            bott = _cross_point(left_seg[0], right_seg[0], x)
-            top = _cross_point(left_seg[1], right_seg[1], x)
-            left_seg = (bott, top)
-            res.append(left_seg)
-            cur_area = 0.0
+    def peak(i: int) -> bool:
+        return rise(i, i + 1) <= 0.0 and rise(i - 1, i) >= 0.0
 
+    k = 0 if peak(0) else None
+    a, b, up_a = 0, m, rise(0, 1) > 0.0
+    while k is None and b - a > 1:
+        c = (a + b) // 2
+        up_c = rise(c, c + 1) > 0.0
+        if peak(c):
+            k = c
+        elif up_a and (not up_c or rise(c, a) > 0.0) or not up_a and not up_c and rise(a, c) > 0.0:
+            b = c
         else:
-            left_seg = right_seg
-            res.append(left_seg)
-            cur_area = 0.0
-            i += 1
+            a, up_a = c, up_c
+    if k is None or rise(k - 1, k) == 0.0 and rise(k, k + 1) == 0.0:
+        # inputs which are not strictly convex, with rounding errors or collinear vertices
+        if _is_ndarray(poly):
+            import numpy as np
 
-    return res
+            return int(np.argmax((poly[:, 0] - poly[0, 0]) * ux + (poly[:, 1] - poly[0, 1]) * uy))
+        return max(range(m), key=lambda i: _rise(poly, 0, i, ux, uy))
+    return k
+
+
+def _extreme_run(poly: Union[_Polygon, "np.ndarray"], ux: float, uy: float) -> Tuple[int, int]:
+    """Get indices of the first and last vertices (counterclockwise) farthest in direction (ux, uy), in O(log V).
+
+    Several vertices are extreme if the polygon has an edge perpendicular to the direction. Neighbours of the
+    vertex found by `_extreme_vertex` are checked too, to settle rounding errors on nearly perpendicular edges.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array
+        ux (float): first-dimensional component of the direction
+        uy (float): second-dimensional component of the direction
+
+    Returns:
+        Tuple[int, int]: indices of the first and last extreme vertices
+    """
+    m = len(poly)
+
+    def rise(i: int, j: int) -> float:
+        return _rise(poly, i, j, ux, uy)
+
+    k = _extreme_vertex(poly, ux, uy)
+    if rise(k, k + 1) < 0.0 and rise(k, k - 1) < 0.0:
+        return k, k
+    if _is_ndarray(poly):
+        return _extreme_run_array(poly, k, ux, uy)
+    for _ in range(m):
+        if rise(k, k + 1) > 0.0:
+            k += 1
+        elif rise(k, k - 1) > 0.0:
+            k -= 1
+        else:
+            break
+    first = last = k
+    while last - first < m - 1 and rise(first, first - 1) == 0.0:
+        first -= 1
+    while last - first < m - 1 and rise(last, last + 1) == 0.0:
+        last += 1
+    return first % m, last % m
+
+
+def _extreme_run_array(p: "np.ndarray", k: int, ux: float, uy: float) -> Tuple[int, int]:
+    """Array version of the end of `_extreme_run`, settling from the k-th vertex on all vertices at once.
+
+    Only needed when vertices around the k-th one are in line with it (or seem so by rounding), where walking
+    them item by item would be O(V) at Python speed.
+    """
+    import numpy as np
+
+    m = len(p)
+    x, y = p[:, 0], p[:, 1]
+    k = int(np.argmax((x - x[k]) * ux + (y - y[k]) * uy))
+    # flat[i]: whether edge p[i]p[i+1] is perpendicular to the direction, as evaluated by `_rise`
+    flat = (np.roll(x, -1) - x) * ux + (np.roll(y, -1) - y) * uy == 0.0
+    ahead, behind = np.roll(flat, -k), flat[(k - 1 - np.arange(m)) % m]
+    last = k + (int(np.argmin(ahead)) if not ahead.all() else m - 1)
+    first = k - (int(np.argmin(behind)) if not behind.all() else m - 1)
+    first = max(first, last - (m - 1))
+    return first % m, last % m
+
+
+class ChainView:
+    """Chain of consecutive vertices of a polygon, viewed without copy and wrapping around its end.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): polygon, a list of points or an (N, 2) array
+        start (int): index of the first vertex of the chain
+        length (int): number of vertices of the chain
+        step (int, optional): 1 to follow the polygon counterclockwise, -1 clockwise. Defaults to 1.
+    """
+
+    __slots__ = ("poly", "start", "length", "step")
+
+    def __init__(self, poly: Union[_Polygon, "np.ndarray"], start: int, length: int, step: int = 1):
+        self.poly = poly
+        self.start = start % len(poly)
+        self.length = length
+        self.step = step
+
+    def __repr__(self):
+        return f"ChainView(start={self.start}, length={self.length}, step={self.step})"
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, k: int):
+        if k < 0:
+            k += self.length
+        if not 0 <= k < self.length:
+            raise IndexError("chain index out of range")
+        return self.poly[(self.start + self.step * k) % len(self.poly)]
+
+    def __iter__(self):
+        m = len(self.poly)
+        for k in range(self.length):
+            yield self.poly[(self.start + self.step * k) % m]
+
+    def slices(self) -> List[slice]:
+        """Get slices of the polygon which, concatenated, give the chain, e.g. views of an array.
 
+        Returns:
+            List[slice]: at most two slices, unless the chain goes round the polygon
+        """
+        m = len(self.poly)
+        res = []
+        k, start = 0, self.start
+        while k < self.length:
+            if self.step > 0:
+                count = min(self.length - k, m - start)
+                res.append(slice(start, start + count))
+            else:
+                count = min(self.length - k, start + 1)
+                res.append(slice(start, start - count if start >= count else None, -1))
+            k += count
+            start = (start + self.step * count) % m
+        return res
 
-def _rotate_coord(origin: List[Point], theta: float) -> None:
+
+def convex_chains(
+    poly: Union[_Polygon, "np.ndarray"], direction: Union[float, Tuple[float, float]]
+) -> Tuple[ChainView, ChainView]:
+    """Split a convex polygon into its lower and upper chains along a direction of sweep, in O(log V).
+
+    Both chains run from the leftmost vertices to the rightmost ones along the direction, the lower chain
+    counterclockwise and the upper chain clockwise, so they share their end vertices unless the polygon has
+    edges perpendicular to the direction.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        direction (Union[float, Tuple[float, float]]): direction of sweep, an angle from x axis in radians
+            or a vector (dx, dy).
+
+    Returns:
+        Tuple[ChainView, ChainView]: lower and upper chains
+    """
+    angle = _direction_angle(direction)
+    ux, uy = cos(angle), sin(angle)
+    m = len(poly)
+    left_first, left_last = _extreme_run(poly, -ux, -uy)
+    right_first, right_last = _extreme_run(poly, ux, uy)
+    lower = ChainView(poly, left_last, (right_first - left_last) % m + 1)
+    upper = ChainView(poly, left_first, (left_first - right_last) % m + 1, -1)
+    return lower, upper
+
+
+def _rotate_coord(origin: Union[List[Point], "np.ndarray"], theta: float) -> None:
     """Rotate coordinate system by `theta`.
 
     Args:
-        origin (List[Point]): coordinates to be translated.
+        origin (Union[List[Point], np.ndarray]): coordinates to be translated, points or an (N, 2) float array.
         theta (float): the angle to rotate
     """
     sin_theta, cos_theta = sin(theta), cos(theta)
+    if _is_ndarray(origin):
+        origin[:] = origin @ ((cos_theta, -sin_theta), (sin_theta, cos_theta))
+        return
     for p in origin:
         px, py = p.x, p.y
         p.x = cos_theta * px + sin_theta * py
         p.y = -sin_theta * px + cos_theta * py
 
 
-def divide_polygon(poly: _Polygon, n: int, idx: int, in_place=False) -> List[_Segment]:
-    """Divede polygon with lines parallel with its idx-th edge.
+def _rotate_back(lines: Union[List[_Segment], "np.ndarray"], theta: float) -> None:
+    """Convert dividing segments to origin coord, from the coordinate system rotated by `theta`.
 
     Args:
-        poly (_Polygon): counterclockwise polygon with edge p[0]p[-1] on y axis.
-        n (int): number of parts to divide polygon into.
-        idx (int): index of edge to be paralleled with.
-        in_place (bool, optional): whether to operate in place (If true, input data would be changed). Defaults to False.
+        lines (Union[List[_Segment], np.ndarray]): dividing segments, or an (M, 2, 2) float array of them.
+        theta (float): the angle coordinate system was rotated by
+    """
+    if _is_ndarray(lines):
+        _rotate_coord(lines.reshape(-1, 2), -theta)
+        return
+    for line in lines:
+        _rotate_coord(line, -theta)
+
+
+def _rotated(origin: Union[List[Point], "np.ndarray"], theta: float) -> Union[List[Point], "np.ndarray"]:
+    """Get coordinates in the coordinate system rotated by `theta`, leaving `origin` untouched.
+
+    Args:
+        origin (Union[List[Point], np.ndarray]): coordinates to be translated, points or an (N, 2) array.
+        theta (float): the angle to rotate
 
     Returns:
-        List[_Segment]: dividing segments
+        Union[List[Point], np.ndarray]: new rotated coordinates
     """
-    if not in_place:
-        p = copy.deepcopy(poly)
-    else:
-        p = poly
-    # rotate current coordinate system by theta(angle from sepc line to y axis)
-    theta = atan2(p[idx - 1].y - p[idx].y, p[idx - 1].x - p[idx].x) - pi / 2.0
-    _rotate_coord(p, theta)
-    # change p[idx] to p[0]
-    p = p[idx:] + p[:idx]
+    sin_theta, cos_theta = sin(theta), cos(theta)
+    if _is_ndarray(origin):
+        return origin @ ((cos_theta, -sin_theta), (sin_theta, cos_theta))
+    return [Point(cos_theta * p.x + sin_theta * p.y, -sin_theta * p.x + cos_theta * p.y) for p in origin]
 
-    lines = _divide_polygon(p, n)
 
-    # convert to origin coord
-    for line in lines:
-        _rotate_coord(line, -theta)
+def _translated(
+    lines: Union[List[_Segment], "np.ndarray"], origin: Tuple[float, float]
+) -> Union[List[_Segment], "np.ndarray"]:
+    """Get dividing segments moved from a local frame to the global one, float64 for arrays."""
+    ox, oy = origin
+    if _is_ndarray(lines):
+        return lines + (float(ox), float(oy))
+    return [(Point(bott.x + ox, bott.y + oy), Point(top.x + ox, top.y + oy)) for bott, top in lines]
 
+
+def local_frame(
+    coords: "np.ndarray", offsets: "np.ndarray" = None, dtype="float32"
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Split coordinates into low-precision offsets from a float64 origin per polygon.
+
+    Origins are the centers of the bounding boxes, so that offsets are at most half the extent of polygons:
+    float32 offsets are then within 2**-25 of it, halving memory traffic of large batches for a relative error
+    of areas of order 1e-7 (see `python benchmark.py --float32`).
+
+    Args:
+        coords (np.ndarray): (V, 2) vertices of a polygon, or of all polygons of a batch.
+        offsets (np.ndarray, optional): (P+1,) offsets of polygons in `coords` as in `divide_polygons_batch`,
+            None for a single polygon. Defaults to None.
+        dtype (optional): dtype of offsets. Defaults to float32.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (V, 2) offsets of vertices from their origin, and the (2,) origin of the
+            polygon or the (P, 2) origins of polygons, float64.
+    """
+    import numpy as np
+
+    coords = np.asarray(coords, dtype=float)
+    if offsets is None:
+        origin = (coords.min(axis=0) + coords.max(axis=0)) / 2.0
+        return (coords - origin).astype(dtype), origin
+    starts = np.asarray(offsets, dtype=np.intp)[:-1]
+    origins = (np.minimum.reduceat(coords, starts) + np.maximum.reduceat(coords, starts)) / 2.0
+    return (coords - np.repeat(origins, np.diff(offsets), axis=0)).astype(dtype), origins
+
+
+def _divide_python(poly: Union[_Polygon, "np.ndarray"], n: int, idx: int) -> Union[List[_Segment], "np.ndarray"]:
+    """Backend "python": rotate and sweep a list of points in pure Python."""
+    as_array = _is_ndarray(poly)
+    p = [Point(x, y) for x, y in poly.tolist()] if as_array else poly
+    theta = _edge_angle(p, idx)
+    p = _rotated(p, theta)
+    lines = _divide_polygon(p[idx:] + p[:idx], n)
+    _rotate_back(lines, theta)
+    if as_array:
+        import numpy as np
+
+        return np.array([(tuple(bott), tuple(top)) for bott, top in lines], dtype=float).reshape(-1, 2, 2)
     return lines
 
 
-# for test
-def _draw_polygon(p: _Polygon, lines=None, title="") -> None:
-    import matplotlib.pyplot as plt
-
-    coord = [(_p.x, _p.y) for _p in p]
-    coord.append(coord[0])
-    xs, ys = zip(*coord)
-    plt.figure()
-    plt.axis("square")
-    plt.xlim(min(p, key=lambda p: p.x).x - 1, max(p, key=lambda p: p.x).x + 1)
-    plt.ylim(min(p, key=lambda p: p.y).y - 1, max(p, key=lambda p: p.y).y + 1)
-    plt.grid(color="r", linestyle="--", linewidth=1, alpha=0.3)
-    plt.plot(xs, ys)
-    if lines:
-        for line in lines:
-            plt.plot([p.x for p in line], [p.y for p in line])
-    if title:
-        plt.savefig(title)
-    else:
-        plt.show()
-
-
-if __name__ == "__main__":
-    import os
-
-    # poly = [Point(3, 3), Point(8, 3), Point(8, 6), Point(3, 6)]
-    # poly = [
-    #     Point(-1, 0),
-    #     Point(0.5, -1),
-    #     Point(1.5, -1.5),
-    #     Point(2.5, -1.5),
-    #     Point(3.5, -1),
-    #     Point(3.5, 3),
-    #     Point(2.5, 3.5),
-    #     Point(1, 3),
-    #     Point(-0.5, 1),
-    # ]
-    poly = [
-        Point(1, 6),
-        Point(4, 2),
-        Point(8, 3),
-        Point(10, 5),
-        Point(7, 9),
-        Point(5, 9),
-    ]
-
-    # print(_sep_polygon_lines(p1))
-
-    # print(_eval_polygon_area([Point(0, 1), Point(2, 3), Point(4, 7)]))
-
-    # print(
-    #     _sep_trapeziod_area(
-    #         [Point(0.0, 0.0), Point(0.0, 1.0)],
-    #         [Point(1.0, 0.00), Point(1.0, 1.00)],
-    #         0.5,
-    #     )
-    # )
-    # for i in range(2, 10):
-    #     print(_divide_polygon(p1, i))
-
-    print(f"polygon: {poly}")
-    for i in range(2, 6):
-        lines = divide_polygon(poly, i, 2)
-        print(f"when n={i}, result: {lines}")
-        _draw_polygon(poly, lines, os.path.join("images", f"divide_{i}.png"))
+def _divide_numpy(poly: Union[_Polygon, "np.ndarray"], n: int, idx: int) -> Union[List[_Segment], "np.ndarray"]:
+    """Backend "numpy": rotate and sweep an (N, 2) array with vectorized operations."""
+    import numpy as np
+
+    as_array = _is_ndarray(poly)
+    p = poly if as_array else np.array([(q.x, q.y) for q in poly], dtype=float).reshape(-1, 2)
+    theta = _edge_angle(p, idx)
+    p = _rotated(p, theta)
+    lines = _divide_polygon_array(np.concatenate((p[idx:], p[:idx])), n)
+    _rotate_back(lines, theta)
+    return lines if as_array else [(Point(*bott), Point(*top)) for bott, top in lines.tolist()]
+
+
+def _divide_compiled(poly: Union[_Polygon, "np.ndarray"], n: int, idx: int) -> Union[List[_Segment], "np.ndarray"]:
+    """Backend "compiled": run the mypyc-compiled accelerator on contiguous double buffers."""
+    from array import array
+
+    if _is_ndarray(poly):
+        import numpy as np
+
+        res = _accel.divide_polygon(array("d", poly[:, 0].tolist()), array("d", poly[:, 1].tolist()), n, idx)
+        return np.array(res, dtype=float).reshape(-1, 2, 2)
+    res = _accel.divide_polygon(array("d", [q.x for q in poly]), array("d", [q.y for q in poly]), n, idx)
+    return [(Point(res[k], res[k + 1]), Point(res[k + 2], res[k + 3])) for k in range(0, len(res), 4)]
+
+
+def _divide_numba(poly: Union[_Polygon, "np.ndarray"], n: int, idx: int) -> Union[List[_Segment], "np.ndarray"]:
+    """Backend "numba": run the Numba-compiled array kernels."""
+    import numpy as np
+    from _divide_polygon_numba import divide_polygon as divide
+
+    if _is_ndarray(poly):
+        return divide(np.ascontiguousarray(poly, dtype=float), n, idx)
+    lines = divide(np.array([(q.x, q.y) for q in poly], dtype=float).reshape(-1, 2), n, idx)
+    return [(Point(*bott), Point(*top)) for bott, top in lines.tolist()]
+
+
+_BACKENDS: Dict[str, Callable] = {}
+
+
+def register_backend(name: str, func: Callable) -> None:
+    """Register a backend of `divide_polygon`, replacing any backend of the same name.
+
+    Args:
+        name (str): name to select the backend by, "auto" being reserved.
+        func (Callable): function `func(poly, n, idx)` returning dividing segments as `divide_polygon` does,
+            for lists of points as well as (N, 2) arrays.
+    """
+    if name == "auto":
+        raise ValueError('backend name "auto" is reserved')
+    _BACKENDS[name] = func
+
+
+def available_backends() -> List[str]:
+    """Get names of the registered backends, which `divide_polygon` accepts besides "auto"."""
+    return list(_BACKENDS)
+
+
+def _module_available(name: str) -> bool:
+    """Check whether a module can be imported, without importing it."""
+    from importlib.util import find_spec
+
+    return name in sys.modules or find_spec(name) is not None
+
+
+register_backend("python", _divide_python)
+if _module_available("numpy"):
+    register_backend("numpy", _divide_numpy)
+if _accel is not None:
+    register_backend("compiled", _divide_compiled)
+if _module_available("numba"):
+    register_backend("numba", _divide_numba)
+
+# (vertices, cuts) at which "auto" moves from the scalar backend to "numpy", for lists of points and for arrays:
+# "numpy" is picked when vertices / V + cuts / N >= 1. Measured against "python" by `python benchmark.py --calibrate`.
+AUTO_THRESHOLDS: Dict[str, Tuple[int, int]] = {"points": (256, 128), "array": (128, 64)}
+
+_backend_local = threading.local()
+
+
+def _auto_backend(poly: Union[_Polygon, "np.ndarray"], n: int) -> str:
+    """Pick the backend expected to be fastest for dividing `poly` into `n` parts."""
+    scalar = "compiled" if "compiled" in _BACKENDS else "python"
+    if "numpy" not in _BACKENDS:
+        return scalar
+    max_vertices, max_cuts = AUTO_THRESHOLDS["array" if _is_ndarray(poly) else "points"]
+    return "numpy" if len(poly) / max_vertices + n / max_cuts >= 1.0 else scalar
+
+
+def _check_backend(name: str) -> str:
+    """Get `name` back if it names a registered backend or "auto", raise ValueError otherwise."""
+    if name != "auto" and name not in _BACKENDS:
+        raise ValueError(f"unknown backend {name!r}, expected one of {['auto'] + available_backends()}")
+    return name
+
+
+def current_backend() -> str:
+    """Get the backend `divide_polygon` uses when none is given.
+
+    It is the one set by `use_backend` in the current thread, else the one named by environment variable
+    `DIVIDE_POLYGON_BACKEND`, else "auto".
+    """
+    name = getattr(_backend_local, "name", None)
+    if name is None:
+        name = os.environ.get("DIVIDE_POLYGON_BACKEND") or "auto"
+    return _check_backend(name)
+
+
+@contextmanager
+def use_backend(name: str) -> Iterator[str]:
+    """Make `divide_polygon` use backend `name` by default in the current thread, inside the with block.
+
+    Args:
+        name (str): name of a registered backend (see `available_backends`) or "auto".
+
+    Yields:
+        str: name of the backend.
+    """
+    prev = getattr(_backend_local, "name", None)
+    _backend_local.name = _check_backend(name)
+    try:
+        yield name
+    finally:
+        _backend_local.name = prev
+
+
+def divide_polygon(
+    poly: Union[_Polygon, "np.ndarray"],
+    n: int,
+    idx: int,
+    in_place=False,
+    holes: List[Union[_Polygon, "np.ndarray"]] = None,
+    backend: str = None,
+    origin: Tuple[float, float] = None,
+) -> Union[List[_Segment], "np.ndarray"]:
+    """Divede polygon with lines parallel with its idx-th edge.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise polygon with edge p[0]p[-1] on y axis,
+            a list of points or an (N, 2) float64 array. Shapely polygons, in any orientation and with their
+            interiors as holes, or arrays of them are accepted too: coordinates are read in bulk, arrays of
+            polygons are divided by `divide_polygons_batch` and `n`, `idx` may then be arrays.
+        n (int): number of parts to divide polygon into.
+        idx (int): index of edge to be paralleled with.
+        in_place (bool, optional): whether to operate in place (If true, input data would be changed). Defaults to False.
+            Kept for backwards compatibility only, as the input is never copied: without it, the polygon is rotated
+            into new coordinates and left untouched.
+        holes (List[Union[_Polygon, np.ndarray]], optional): rings of holes inside the polygon. If given, parts have
+            equal net area and a cut crossing holes is made of several segments (see `divide_simple_polygon`),
+            `in_place` and `backend` being ignored. Defaults to None.
+        backend (str, optional): implementation to use, "python", "numpy", "compiled", "numba" (see
+            `available_backends`) or "auto" to choose by size of the job, ignored if `in_place`. Defaults to None,
+            for `current_backend()`.
+        origin (Tuple[float, float], optional): origin of the local frame `poly` (and `holes`) are given in, e.g.
+            float32 offsets returned by `local_frame`, dividing segments being returned in the global frame.
+            Defaults to None.
+
+    Returns:
+        Union[List[_Segment], np.ndarray]: dividing segments, an (n-1, 2, 2) array of (bottom, top) points
+            if `poly` is an array, a Shapely MultiLineString (or an array of them) if `poly` is Shapely.
+    """
+    if _is_shapely(poly):
+        return _divide_shapely(poly, n, idx, holes, backend, origin)
+    if origin is not None:
+        return _translated(divide_polygon(poly, n, idx, in_place, holes, backend), origin)
+    backend = current_backend() if backend is None else _check_backend(backend)
+    if holes:
+        cuts = divide_simple_polygon(poly, n, idx, holes)
+        if _is_ndarray(poly):
+            import numpy as np
+
+            return np.concatenate(cuts) if cuts else np.empty((0, 2, 2))
+        return [line for cut in cuts for line in cut]
+
+    if not in_place:
+        if backend == "auto":
+            backend = _auto_backend(poly, n)
+        return _BACKENDS[backend](poly, n, idx)
+
+    # rotate current coordinate system by theta(angle from sepc line to y axis)
+    theta = _edge_angle(poly, idx)
+    p = poly
+    _rotate_coord(p, theta)
+    # change p[idx] to p[0]
+    if _is_ndarray(p):
+        import numpy as np
+
+        p = np.concatenate((p[idx:], p[:idx]))
+        lines = _divide_polygon_array(p, n)
+        _rotate_back(lines, theta)
+        return lines
+    p = p[idx:] + p[:idx]
+
+    lines = _divide_polygon(p, n)
+
+    # convert to origin coord
+    _rotate_back(lines, theta)
+
+    return lines
+
+
+def divide_polygon_along(
+    poly: Union[_Polygon, "np.ndarray"], n: int, direction: Union[float, Tuple[float, float]]
+) -> Union[List[_Segment], "np.ndarray"]:
+    """Divede polygon with lines parallel with a direction.
+
+    The sweep starts from the vertex farthest on the left of `direction`, found by binary search (see
+    `convex_chains`), so that `divide_polygon(poly, n, idx)` is
+    `divide_polygon_along(poly, n, poly[idx - 1] - poly[idx])`. The polygon is not re-indexed to start there:
+    a list of points is rotated in the order of the sweep, and an array is swept along views of its chains.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        n (int): number of parts to divide polygon into.
+        direction (Union[float, Tuple[float, float]]): direction of dividing lines, an angle from x axis in
+            radians or a vector (dx, dy).
+
+    Returns:
+        Union[List[_Segment], np.ndarray]: dividing segments, an (n-1, 2, 2) array of (bottom, top) points
+            if `poly` is an array.
+    """
+    theta = _direction_angle(direction) - pi / 2.0
+    if _is_ndarray(poly):
+        import numpy as np
+
+        # bottom and top chains of the sweep, which share their leftmost vertex if there is a single one
+        p = _rotated(poly, theta)
+        lower, upper = convex_chains(p, 0.0)
+        bottom, top = (
+            p[view.slices()[0]] if len(view.slices()) == 1 else np.concatenate([p[s] for s in view.slices()])
+            for view in (lower, upper)
+        )
+        # chains end at the first of their rightmost vertices, which rounding may hide from `convex_chains`
+        tol = _rounding_tolerance(p)
+        bottom, top = bottom[: _first_rightmost(bottom[:, 0], tol) + 1], top[: _first_rightmost(top[:, 0], tol) + 1]
+        lines = _divide_chains_array(bottom, top, n, _polygon_area(p))
+    else:
+        # start from the lowest leftmost vertex, the left edge p[0]p[-1] being vertical or made degenerate by
+        # repeating p[0] if there is a single leftmost vertex
+        lower, upper = convex_chains(poly, theta)
+        m = len(poly)
+        lines = _divide_polygon(_rotated(ChainView(poly, lower.start, m + (upper.start == lower.start)), theta), n)
+    _rotate_back(lines, theta)
+    return lines
+
+
+def iter_divide_polygon(
+    poly: Union[_Polygon, "np.ndarray"], n: int, idx: int
+) -> Iterator[Union[_Segment, "np.ndarray"]]:
+    """Divede polygon with lines parallel with its idx-th edge, yielding dividing segments as they are computed.
+
+    Memory used besides the polygon itself does not depend on `n`.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        n (int): number of parts to divide polygon into.
+        idx (int): index of edge to be paralleled with.
+
+    Yields:
+        Union[_Segment, np.ndarray]: dividing segments (bottom, top) from the idx-th edge on, (2, 2) arrays
+            if `poly` is an array.
+    """
+    theta = _edge_angle(poly, idx)
+    p = _rotated(poly, theta)
+    as_array = _is_ndarray(p)
+    if as_array:
+        import numpy as np
+
+        p = [Point(x, y) for x, y in p.tolist()]
+    for line in _iter_divide_polygon(p[idx:] + p[:idx], n):
+        _rotate_back((line,), theta)
+        yield np.array([[line[0].x, line[0].y], [line[1].x, line[1].y]]) if as_array else line
+
+
+def divide_all_orientations(
+    poly: Union[_Polygon, "np.ndarray"], n: int
+) -> Dict[int, Union[List[_Segment], "np.ndarray"]]:
+    """Divede polygon with lines parallel with each of its edges in turn.
+
+    Arrays, and lists of 64 points or more if numpy is available, are not swept once per edge: cuts of all
+    orientations are searched at once (see `_divide_all_orientations_array`), in O(V n log² V) rather than
+    O(V²). Smaller lists of points are divided edge by edge, computing their area once.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        n (int): number of parts to divide polygon into.
+
+    Returns:
+        Dict[int, Union[List[_Segment], np.ndarray]]: dividing segments for each index of edge, as returned
+            by `divide_polygon(poly, n, idx)`.
+    """
+    as_array = _is_ndarray(poly)
+    # measured: searching all orientations at once beats sweeping lists of points edge by edge from 64 vertices
+    if as_array or ("numpy" in _BACKENDS and current_backend() in ("auto", "numpy") and len(poly) >= 64):
+        import numpy as np
+
+        p = np.asarray(poly, dtype=float) if as_array else np.array([(q.x, q.y) for q in poly], dtype=float)
+        res = _divide_all_orientations_array(p.reshape(-1, 2), n)
+        if as_array:
+            return res
+        return {idx: [(Point(*bott), Point(*top)) for bott, top in lines.tolist()] for idx, lines in res.items()}
+
+    area = _polygon_area(poly)
+    res = {}
+    for idx in range(len(poly)):
+        theta = _edge_angle(poly, idx)
+        p = _rotated(poly, theta)
+        lines = _divide_polygon(p[idx:] + p[:idx], n, area)
+        _rotate_back(lines, theta)
+        res[idx] = lines
+    return res
+
+
+def _divide_all_orientations_array(p: "np.ndarray", n: int) -> Dict[int, "np.ndarray"]:
+    """Array version of `divide_all_orientations`, sweeping no orientation in full.
+
+    Cutting lines parallel with the idx-th edge cross the bottom chain (from p[idx] to the antipodal vertex)
+    and the top chain (from p[idx-1] back to it) once each, and the area they leave behind is a prefix sum of
+    the shoelace terms of the polygon, which do not depend on the orientation, plus the terms of the cut.
+    So each cut is found by binary searches on both chains, for all orientations and cuts at once,
+    in O(V n log² V) instead of O(V²) for sweeping each orientation.
+    """
+    import numpy as np
+
+    m, cuts = len(p), max(n - 1, 0)
+    if not cuts:
+        return {idx: np.empty((0, 2, 2)) for idx in range(m)}
+    center = (p.min(axis=0) + p.max(axis=0)) / 2.0
+    q = p - center  # shoelace terms of far vertices lose precision
+    ext = np.concatenate((q, q, q))  # vertex i is ext[i], ext[i + m] and ext[i + 2m]
+    prefix = np.concatenate(([0.0], np.cumsum(ext[:-1, 0] * ext[1:, 1] - ext[1:, 0] * ext[:-1, 1])))
+    edges = q - np.roll(q, 1, axis=0)  # edge idx, from p[idx-1] to p[idx]
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    # antipodal vertex: the first one whose next edge has turned by pi from edge idx
+    turns = np.unwrap(np.arctan2(edges[:, 1], edges[:, 0]))
+    turns = np.concatenate((turns, turns + 2.0 * pi, turns + 4.0 * pi))
+    antipodes = np.searchsorted(turns, turns[:m] + pi) - 1
+
+    # one query per (orientation, cut), vertices of orientation s being ext[s] to ext[s + m - 1]
+    s = np.repeat(np.arange(m), cuts)
+    a = antipodes[s]
+    ux, uy = -edges[s, 1] / lengths[s], edges[s, 0] / lengths[s]  # inward normal, direction of the sweep
+    wx, wy = -edges[s, 0] / lengths[s], -edges[s, 1] / lengths[s]  # from bottom to top
+    origin = q[s]
+    twice_areas = 2.0 * _polygon_area(p) / n * np.tile(np.arange(1, n), m)
+
+    def height(j):
+        return (ext[j, 0] - origin[:, 0]) * ux + (ext[j, 1] - origin[:, 1]) * uy
+
+    def search(lo, hi, below):
+        # last index of [lo, hi) for which `below` holds, `below` holding at lo and being monotone
+        while True:
+            active = hi - lo > 1
+            if not active.any():
+                return lo
+            mid = (lo + hi) // 2
+            ok = active & below(mid)
+            lo, hi = np.where(ok, mid, lo), np.where(active & ~ok, mid, hi)
+
+    def crossing(j, k, c):
+        # point of edge ext[j]ext[k] at height c
+        hj, hk = height(j), height(k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(hk > hj, (c - hj) / (hk - hj), 0.0)
+        return ext[j] + t[:, np.newaxis] * (ext[k] - ext[j])
+
+    def cross(u, v):
+        return u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+
+    def twice_area_at(c, b, t):
+        # twice the area behind height c, crossing edges (b, b+1) and (t-1, t)
+        bottom, top = crossing(b, np.minimum(b + 1, a), c), crossing(t, np.maximum(t - 1, a), c)
+        area = prefix[b + m] - prefix[t] + cross(ext[b], bottom) + cross(bottom, top) + cross(top, ext[t])
+        return area, bottom, top
+
+    # vertices of each chain at or below height c, the top chain being searched backwards from p[s-1]
+    def bottom_at(c):
+        return search(s, a + 1, lambda j: height(j) <= c)
+
+    def top_at(c):
+        last = s + m - 1
+        return last - search(np.zeros_like(s), last - a + 1, lambda k: height(last - k) <= c)
+
+    def below(j):
+        c = height(j)
+        return twice_area_at(c, bottom_at(c), top_at(c))[0] <= twice_areas
+
+    b = search(s, a + 1, below)
+    last = s + m - 1
+    t = last - search(np.zeros_like(s), last - a + 1, lambda k: below(last - k))
+
+    # the cut is in the trapezoid between the next vertices of both chains
+    b_next, t_next = np.minimum(b + 1, a), np.maximum(t - 1, a)
+    c0 = np.maximum(height(b), height(t))
+    c1 = np.maximum(np.minimum(height(b_next), height(t_next)), c0)
+    area0, bottom0, top0 = twice_area_at(c0, b, t)
+    _, bottom1, top1 = twice_area_at(c1, b, t)
+    len0 = (top0[:, 0] - bottom0[:, 0]) * wx + (top0[:, 1] - bottom0[:, 1]) * wy
+    len1 = (top1[:, 0] - bottom1[:, 0]) * wx + (top1[:, 1] - bottom1[:, 1]) * wy
+    trap_areas = (len0 + len1) * (c1 - c0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(trap_areas > 0.0, (twice_areas - area0) / trap_areas, 1.0)
+    frac = _sep_trapezoids(len0, len1, np.clip(ratio, 0.0, 1.0))[:, np.newaxis]
+    lines = np.stack((bottom0 + frac * (bottom1 - bottom0), top0 + frac * (top1 - top0)), axis=1) + center
+    return dict(enumerate(lines.reshape(m, cuts, 2, 2)))
+
+
+def _interp_chains(
+    ev_pid: "np.ndarray", ev_x: "np.ndarray", ch_pid: "np.ndarray", ch_x: "np.ndarray", ch_y: "np.ndarray"
+) -> "np.ndarray":
+    """Interpolate many polygon chains at once.
+
+    Args:
+        ev_pid (np.ndarray): polygon of each event, events sorted by (polygon, x)
+        ev_x (np.ndarray): first-dimensional coordinate of each event
+        ch_pid (np.ndarray): polygon of each chain vertex, vertices sorted by (polygon, x)
+        ch_x (np.ndarray): first-dimensional coordinate of each chain vertex
+        ch_y (np.ndarray): second-dimensional coordinate of each chain vertex
+
+    Returns:
+        np.ndarray: second-dimensional coordinate of each event on the chain of its polygon
+    """
+    import numpy as np
+
+    n_ch = len(ch_x)
+    is_ev = np.concatenate((np.zeros(n_ch, dtype=bool), np.ones(len(ev_x), dtype=bool)))
+    order = np.lexsort((is_ev, np.concatenate((ch_x, ev_x)), np.concatenate((ch_pid, ev_pid))))
+    # last chain vertex at or before each event
+    last = np.maximum.accumulate(np.where(is_ev[order], -1, order))[is_ev[order]]
+    first = np.searchsorted(ch_pid, ev_pid)
+    j = np.where((last >= 0) & (ch_pid[np.maximum(last, 0)] == ev_pid), last, first)
+    k = np.minimum(j + 1, n_ch - 1)
+    k = np.where(ch_pid[k] == ev_pid, k, j)
+    dx = ch_x[k] - ch_x[j]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(dx > 0.0, (ev_x - ch_x[j]) / dx, 0.0)
+    return ch_y[j] + t * (ch_y[k] - ch_y[j])
+
+
+def divide_polygons_batch(
+    coords: "np.ndarray", offsets: "np.ndarray", ns, idxs, origins: "np.ndarray" = None
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Divide a batch of polygons, each with lines parallel with its idx-th edge.
+
+    The whole batch is processed with vectorized numpy operations: rotations, shoelace areas,
+    trapezoid sweeps and cut positions are computed for all polygons at once.
+
+    Args:
+        coords (np.ndarray): (V, 2) vertices of all polygons, each one counterclockwise and convex.
+        offsets (np.ndarray): (P+1,) offsets of polygons in `coords`, the i-th polygon being
+            coords[offsets[i]:offsets[i+1]].
+        ns (Union[int, np.ndarray]): number of parts to divide each polygon into.
+        idxs (Union[int, np.ndarray]): index of edge of each polygon to be paralleled with.
+        origins (np.ndarray, optional): (P, 2) origins of the local frames `coords` are given in, e.g. float32
+            offsets returned by `local_frame`. Offsets are read as is and computed on in float64, in the global
+            frame dividing segments are returned in. Defaults to None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (S, 2, 2) dividing segments (bottom, top) of all polygons,
+            and (P+1,) offsets of each polygon's segments in them.
+    """
+    import numpy as np
+
+    coords = np.asarray(coords)
+    if coords.dtype != np.float32:
+        coords = coords.astype(float, copy=False)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(offsets)
+    n_poly = len(counts)
+    ns = np.broadcast_to(np.asarray(ns, dtype=np.intp), (n_poly,))
+    idxs = np.broadcast_to(np.asarray(idxs, dtype=np.intp), (n_poly,))
+
+    # change p[idx] to p[0] and rotate coordinate system by theta of each polygon
+    starts = np.cumsum(counts) - counts
+    pid = np.repeat(np.arange(n_poly), counts)
+    local = np.arange(len(pid)) - starts[pid]
+    p = coords[offsets[:-1][pid] + (local + idxs[pid]) % counts[pid]].astype(float, copy=False)
+    if origins is not None:
+        # in the global frame, polygons are apart from each other, which sorts them much faster
+        p += np.asarray(origins, dtype=float)[pid]
+    prev = coords[offsets[:-1] + (idxs - 1) % counts].astype(float)
+    cur = coords[offsets[:-1] + idxs % counts].astype(float)
+    theta = np.arctan2(prev[:, 1] - cur[:, 1], prev[:, 0] - cur[:, 0]) - pi / 2.0
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    x = cos_theta[pid] * p[:, 0] + sin_theta[pid] * p[:, 1]
+    y = -sin_theta[pid] * p[:, 0] + cos_theta[pid] * p[:, 1]
+
+    # shoelace areas, x being re-centered on the first vertex of each polygon
+    last = starts + counts - 1
+    before = np.arange(len(pid)) - 1
+    before[starts] = last
+    x_local = x - x[starts][pid]
+    areas = np.abs(np.add.reduceat((x_local[before] + x_local) * (y[before] - y), starts)) / 2.0
+
+    # chains: bottom one from p[0], top one from p[-1], both to the rightmost vertices, up to rounding
+    # as in `_sweep_chains_array`
+    tol = 16.0 * np.finfo(float).eps * np.maximum.reduceat(np.abs(p).max(axis=1), starts)
+    is_max = x >= (np.maximum.reduceat(x, starts) - tol)[pid]
+    k_bottom = np.minimum.reduceat(np.where(is_max, local, len(pid)), starts)
+    k_top = np.maximum.reduceat(np.where(is_max, local, -1), starts)
+    bottom = local <= k_bottom[pid]
+    top = np.flatnonzero(local >= k_top[pid])
+    top = top[np.lexsort((-local[top], pid[top]))]
+
+    # sweep events: distinct x of all vertices but the first edge
+    ev = np.flatnonzero((local > 0) & (local < counts[pid] - 1))
+    ev = ev[np.lexsort((x[ev], pid[ev]))]
+    ev = ev[np.concatenate(([True], (pid[ev][1:] != pid[ev][:-1]) | (x[ev][1:] != x[ev][:-1])))]
+    ev_pid, ev_x = pid[ev], x[ev]
+    ev_bottom = _interp_chains(ev_pid, ev_x, pid[bottom], x[bottom], y[bottom])
+    ev_top = _interp_chains(ev_pid, ev_x, pid[top], x[top], y[top])
+
+    # dividing segments of all polygons, each polygon beginning with its first edge
+    b_pid = np.concatenate((np.arange(n_poly), ev_pid))
+    order = np.argsort(b_pid, kind="stable")
+    b_pid = b_pid[order]
+    b_x = np.concatenate((x[starts], ev_x))[order]
+    b_bottom = np.concatenate((y[starts], ev_bottom))[order]
+    b_top = np.concatenate((y[last], ev_top))[order]
+    heights = b_top - b_bottom
+    b_first = np.searchsorted(b_pid, np.arange(n_poly))
+    b_last = np.searchsorted(b_pid, np.arange(n_poly), side="right") - 1
+
+    # trapezoid on the left of each dividing segment and cumulative areas
+    trap_areas = np.zeros(len(b_pid))
+    trap_areas[1:] = (heights[:-1] + heights[1:]) * (b_x[1:] - b_x[:-1]) / 2.0
+    trap_areas[b_first] = 0.0
+    cum_areas = np.cumsum(trap_areas)
+    cum_areas -= cum_areas[b_first][b_pid]
+
+    # locate each desired area: the number of dividing segments before it in (polygon, area) order
+    cuts = np.maximum(ns - 1, 0)
+    c_pid = np.repeat(np.arange(n_poly), cuts)
+    k = np.arange(len(c_pid)) - (np.cumsum(cuts) - cuts)[c_pid] + 1
+    des_areas = areas[c_pid] / ns[c_pid] * k
+    is_seg = np.concatenate((np.ones(len(b_pid), dtype=bool), np.zeros(len(c_pid), dtype=bool)))
+    order = np.lexsort((is_seg, np.concatenate((cum_areas, des_areas)), np.concatenate((b_pid, c_pid))))
+    i = np.cumsum(is_seg[order])[~is_seg[order]]
+    i = np.clip(i, b_first[c_pid] + 1, b_last[c_pid])
+
+    cur_areas = des_areas - (cum_areas[i] - trap_areas[i])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(trap_areas[i] > 0.0, cur_areas / trap_areas[i], 1.0)
+    t = _sep_trapezoids(heights[i - 1], heights[i], np.clip(ratio, 0.0, 1.0))
+    seg_x = b_x[i - 1] + t * (b_x[i] - b_x[i - 1])
+    seg_x = np.stack((seg_x, seg_x), axis=-1)
+    seg_y = np.stack(
+        (b_bottom[i - 1] + t * (b_bottom[i] - b_bottom[i - 1]), b_top[i - 1] + t * (b_top[i] - b_top[i - 1])), axis=-1
+    )
+
+    # convert to origin coord
+    cos_theta, sin_theta = cos_theta[c_pid, np.newaxis], sin_theta[c_pid, np.newaxis]
+    segs = np.stack((cos_theta * seg_x - sin_theta * seg_y, sin_theta * seg_x + cos_theta * seg_y), axis=-1)
+    return segs, np.concatenate(([0], np.cumsum(cuts)))
+
+
+def _is_shapely(obj) -> bool:
+    """Check whether `obj` is a Shapely geometry or an array of them, without importing shapely."""
+    shapely = sys.modules.get("shapely")
+    if shapely is None:
+        return False
+    return isinstance(obj, shapely.Geometry) or (_is_ndarray(obj) and obj.dtype == object)
+
+
+def _shapely_exteriors(polys: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Get exterior rings of Shapely polygons as counterclockwise vertices, without building points.
+
+    Coordinates are copied out of GEOS in one call, then gathered in one go, dropping the closing vertex
+    of each ring and reversing clockwise rings.
+
+    Args:
+        polys (np.ndarray): (P,) Shapely polygons, or None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (V, 2) vertices of all polygons, (P+1,) offsets of polygons
+            in them as in `divide_polygons_batch`, and (P,) whether each ring was reversed.
+    """
+    import numpy as np
+    import shapely
+
+    type_ids = shapely.get_type_id(polys)
+    if np.any((type_ids != shapely.GeometryType.POLYGON) & (type_ids != shapely.GeometryType.MISSING)):
+        raise TypeError("only Shapely polygons can be divided")
+    rings = shapely.get_exterior_ring(polys)
+    ring_counts = shapely.get_num_coordinates(rings)
+    counts = np.maximum(ring_counts - 1, 0)
+    reversed_ = ~shapely.is_ccw(rings) & (counts > 0)
+    coords = shapely.get_coordinates(rings)
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    pid = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(len(pid)) - offsets[:-1][pid]
+    local = np.where(reversed_[pid], counts[pid] - 1 - local, local)
+    return coords[(np.cumsum(ring_counts) - ring_counts)[pid] + local], offsets, reversed_
+
+
+def _divide_shapely(polys, n, idx, holes=None, backend: str = None, origin=None):
+    """Divide Shapely polygons, as `divide_polygon`, returning dividing segments as Shapely geometries.
+
+    Interiors of polygons are divided around as `holes`. An array of polygons is divided in one
+    `divide_polygons_batch` call, except polygons with holes; `n` and `idx` may then be arrays too.
+
+    Returns:
+        Union[shapely.MultiLineString, np.ndarray]: dividing segments of the polygon, or an array of them
+            shaped as `polys` (None for missing polygons).
+    """
+    import numpy as np
+    import shapely
+
+    single = not _is_ndarray(polys)
+    flat = np.asarray([polys] if single else polys, dtype=object).ravel()
+    coords, offsets, reversed_ = _shapely_exteriors(flat)
+    counts = np.diff(offsets)
+    # edges are indexed in the original order of vertices
+    shape = () if single else np.shape(polys)
+    ns = np.broadcast_to(np.asarray(n, dtype=np.intp), shape).ravel()
+    idxs = np.broadcast_to(np.asarray(idx, dtype=np.intp), shape).ravel()
+    idxs = np.where(reversed_, counts - idxs % np.maximum(counts, 1), idxs) % np.maximum(counts, 1)
+
+    res = np.full(len(flat), shapely.multilinestrings(np.empty(0, dtype=object)), dtype=object)
+    res[shapely.is_missing(flat)] = None
+    one_by_one = shapely.get_num_interior_rings(flat) > 0
+    if single or holes:
+        one_by_one |= counts >= 3
+    for i in np.flatnonzero(one_by_one):
+        interiors = shapely.get_rings(flat[i])[1:]
+        rings = [ring[:-1] for ring in (shapely.get_coordinates(r) for r in interiors)] + list(holes or ())
+        segs = divide_polygon(
+            coords[offsets[i] : offsets[i + 1]], int(ns[i]), int(idxs[i]), holes=rings, backend=backend, origin=origin
+        )
+        res[i] = shapely.multilinestrings(shapely.linestrings(segs))
+
+    batch = np.flatnonzero(~one_by_one & (counts >= 3))
+    if len(batch):
+        sizes = counts[batch]
+        starts = np.repeat(offsets[:-1][batch] - (np.cumsum(sizes) - sizes), sizes)
+        segs, seg_offsets = divide_polygons_batch(
+            coords[starts + np.arange(sizes.sum())],
+            np.concatenate(([0], np.cumsum(sizes))),
+            ns[batch],
+            idxs[batch],
+            None if origin is None else np.broadcast_to(np.asarray(origin, dtype=float), (len(batch), 2)),
+        )
+        seg_pid = np.repeat(batch, np.diff(seg_offsets))
+        shapely.multilinestrings(shapely.linestrings(segs), indices=seg_pid, out=res)
+    return res[0] if single else res.reshape(np.shape(polys))
+
+
+def _pack_chunk(chunk: list):
+    """Copy coordinates of a chunk of polygons into a new shared memory block.
+
+    Args:
+        chunk (list): polygons, all lists of points or all (N, 2) arrays
+
+    Returns:
+        Tuple[SharedMemory, List[int], bool]: shared memory block, offsets of polygons in it,
+            and whether polygons are arrays
+    """
+    from array import array
+    from multiprocessing import shared_memory
+
+    as_array = _is_ndarray(chunk[0])
+    offsets = [0]
+    for p in chunk:
+        offsets.append(offsets[-1] + len(p))
+    shm = shared_memory.SharedMemory(create=True, size=max(16 * offsets[-1], 16))
+    if as_array:
+        import numpy as np
+
+        coords = np.ndarray((offsets[-1], 2), dtype=float, buffer=shm.buf)
+        coords[:] = np.concatenate(chunk)
+        del coords
+    else:
+        buf = shm.buf.cast("d")
+        buf[: 2 * offsets[-1]] = array("d", [c for p in chunk for q in p for c in q])
+        buf.release()
+    return shm, offsets, as_array
+
+
+def _divide_chunk(shm_name: str, offsets: List[int], n: int, idx: int, as_array: bool):
+    """Divide a chunk of polygons packed by `_pack_chunk`, in a worker process.
+
+    Returns:
+        Tuple: (S, 2, 2) segments and their offsets if polygons are arrays, otherwise flat
+            coordinates of segments and number of segments of each polygon
+    """
+    from array import array
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        if as_array:
+            import numpy as np
+
+            coords = np.ndarray((offsets[-1], 2), dtype=float, buffer=shm.buf)
+            try:
+                return divide_polygons_batch(coords, offsets, n, idx)
+            finally:
+                # views of the block must be gone before closing it, or errors are hidden by a BufferError
+                del coords
+
+        buf = shm.buf.cast("d")
+        try:
+            res, counts = array("d"), []
+            for i in range(len(offsets) - 1):
+                p = [Point(buf[2 * j], buf[2 * j + 1]) for j in range(offsets[i], offsets[i + 1])]
+                lines = divide_polygon(p, n, idx)
+                counts.append(len(lines))
+                for bott, top in lines:
+                    res.extend((bott.x, bott.y, top.x, top.y))
+            return res, counts
+        finally:
+            buf.release()
+    finally:
+        shm.close()
+
+
+def _unpack_chunk(res, as_array: bool) -> list:
+    """Split the result of `_divide_chunk` into the dividing segments of each polygon."""
+    if as_array:
+        segs, offsets = res
+        return [segs[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    coords, counts = res
+    out, j = [], 0
+    for count in counts:
+        out.append([(Point(*coords[k : k + 2]), Point(*coords[k + 2 : k + 4])) for k in range(j, j + 4 * count, 4)])
+        j += 4 * count
+    return out
+
+
+def divide_polygons_parallel(polys, n: int, idx: int, workers: int = None, chunksize: int = 256, ordered=True):
+    """Divide polygons with lines parallel with their idx-th edge, in a pool of processes.
+
+    Polygons are sent to workers in chunks, whose coordinates are shipped in shared memory.
+
+    Args:
+        polys (Iterable[Union[_Polygon, np.ndarray]]): polygons, all lists of points or all (N, 2) arrays.
+        n (int): number of parts to divide each polygon into.
+        idx (int): index of edge to be paralleled with.
+        workers (int, optional): number of worker processes. Defaults to the number of CPUs.
+        chunksize (int, optional): number of polygons sent to a worker at a time. Defaults to 256.
+        ordered (bool, optional): whether to yield results in input order. Defaults to True.
+
+    Yields:
+        Union[List[_Segment], np.ndarray]: dividing segments of each polygon if `ordered`,
+            otherwise (index of polygon, dividing segments) as soon as they are available.
+    """
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from itertools import islice
+
+    workers = workers or os.cpu_count() or 1
+    polys = iter(polys)
+    pending = deque()  # (future, shared memory, index of first polygon, whether polygons are arrays)
+    start = 0
+
+    def submit() -> bool:
+        nonlocal start
+        chunk = list(islice(polys, chunksize))
+        if not chunk:
+            return False
+        shm, offsets, as_array = _pack_chunk(chunk)
+        future = executor.submit(_divide_chunk, shm.name, offsets, n, idx, as_array)
+        pending.append((future, shm, start, as_array))
+        start += len(chunk)
+        return True
+
+    def release(item) -> None:
+        pending.remove(item)
+        item[1].close()
+        item[1].unlink()
+
+    with ProcessPoolExecutor(workers) as executor:
+        try:
+            while len(pending) < 2 * workers and submit():
+                pass
+            while pending:
+                if ordered:
+                    item = pending[0]
+                    item[0].result()
+                else:
+                    wait([item[0] for item in pending], return_when=FIRST_COMPLETED)
+                    item = next(item for item in pending if item[0].done())
+                future, _, first, as_array = item
+                release(item)
+                submit()
+                for i, lines in enumerate(_unpack_chunk(future.result(), as_array), first):
+                    yield lines if ordered else (i, lines)
+        finally:
+            for item in list(pending):
+                item[0].cancel()
+                wait([item[0]])
+                release(item)
+
+
+def _neumaier_add(total: float, comp: float, value: float) -> Tuple[float, float]:
+    """Add `value` to a compensated sum (Neumaier's variant of Kahan summation).
+
+    Args:
+        total (float): running sum
+        comp (float): running compensation, the sum being `total + comp`
+        value (float): value to add
+
+    Returns:
+        Tuple[float, float]: new running sum and compensation
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        comp += (total - new_total) + value
+    else:
+        comp += (value - new_total) + total
+    return new_total, comp
+
+
+def _signed_area(ring: List[Tuple[float, float]]) -> float:
+    """Evaluate signed area of a ring using shoelace formula, positive if it is counterclockwise."""
+    area = 0.0
+    x0 = ring[0][0]
+    x_prev, y_prev = ring[-1]
+    x_prev -= x0
+    for x, y in ring:
+        x -= x0
+        area += (x_prev + x) * (y - y_prev)
+        x_prev, y_prev = x, y
+    return area / 2.0
+
+
+def _divide_rings(rings: List[List[Tuple[float, float]]], n: int) -> List[List[Tuple[float, float, float]]]:
+    """Divide a simple polygon, possibly non-convex and with holes, with lines parallel with y axis.
+
+    The net length of the cross-section of the polygon at `x` is piecewise linear between the sorted
+    vertex coordinates `x` of all rings (slabs), so the area on its left is piecewise quadratic. Both
+    are evaluated by sweeping the edges of all rings sorted by `x`, holes contributing negatively,
+    and each cut is solved in closed form in its slab.
+
+    Args:
+        rings (List[List[Tuple[float, float]]]): outer ring of the polygon then its holes, in any orientation.
+        n (int): number of parts to divide polygon into.
+
+    Returns:
+        List[List[Tuple[float, float, float]]]: (x, bottom y, top y) of the dividing segments of each cut,
+            a cut line possibly crossing the polygon several times.
+    """
+    # edges from left to right, with the sign of their contribution to the cross-section length
+    edges = []  # (left x, left y, right x, right y, sign)
+    area = 0.0
+    for k, ring in enumerate(rings):
+        signed_area = _signed_area(ring)
+        weight = (1.0 if signed_area > 0.0 else -1.0) * (1.0 if k == 0 else -1.0)
+        area += weight * signed_area
+        (x_prev, y_prev) = ring[-1]
+        for x, y in ring:
+            if x_prev < x:
+                edges.append((x_prev, y_prev, x, y, -weight))
+            elif x_prev > x:
+                edges.append((x, y, x_prev, y_prev, weight))
+            x_prev, y_prev = x, y
+
+    # cross-section length steps and slopes at each event, then at both sides of each slab. Nearly
+    # vertical edges have huge slopes, so running sums are compensated to cancel them exactly.
+    xs = sorted({e[0] for e in edges} | {e[2] for e in edges})
+    event = {x: i for i, x in enumerate(xs)}
+    steps = [[] for _ in xs]
+    slopes = [[] for _ in xs]
+    for x0, y0, x1, y1, sign in edges:
+        slope = sign * (y1 - y0) / (x1 - x0)
+        i, j = event[x0], event[x1]
+        steps[i].append(sign * y0)
+        steps[j].append(-sign * y1)
+        slopes[i].append(slope)
+        slopes[j].append(-slope)
+    length = length_comp = slope = slope_comp = 0.0
+    heights = []  # (left, right) cross-section length of each slab
+    for i in range(len(xs) - 1):
+        for value in steps[i]:
+            length, length_comp = _neumaier_add(length, length_comp, value)
+        for value in slopes[i]:
+            slope, slope_comp = _neumaier_add(slope, slope_comp, value)
+        left = length + length_comp
+        length, length_comp = _neumaier_add(length, length_comp, (slope + slope_comp) * (xs[i + 1] - xs[i]))
+        heights.append((left, length + length_comp))
+    cum_areas = list(accumulate((a + b) * (xs[i + 1] - xs[i]) / 2.0 for i, (a, b) in enumerate(heights)))
+
+    # cut positions
+    des_area = area / n
+    cut_xs = []
+    for k in range(1, n):
+        i = min(bisect_left(cum_areas, des_area * k), len(cum_areas) - 1)
+        trap_area = cum_areas[i] - (cum_areas[i - 1] if i else 0.0)
+        ratio = (des_area * k - (cum_areas[i - 1] if i else 0.0)) / trap_area if trap_area > 0.0 else 1.0
+        t = _sep_fraction(heights[i][0], heights[i][1], min(max(ratio, 0.0), 1.0))
+        cut_xs.append(xs[i] + t * (xs[i + 1] - xs[i]))
+
+    # dividing segments, sweeping the edges which cross each cut line
+    edges.sort()
+    res = []
+    active = []
+    j = 0
+    for x in cut_xs:
+        while j < len(edges) and edges[j][0] <= x:
+            active.append(edges[j])
+            j += 1
+        active = [e for e in active if e[2] > x]
+        ys = sorted(y0 + (y1 - y0) * (x - x0) / (x1 - x0) for x0, y0, x1, y1, _ in active)
+        res.append([(x, ys[i], ys[i + 1]) for i in range(0, len(ys) - 1, 2) if ys[i + 1] > ys[i]])
+    return res
+
+
+def divide_simple_polygon(
+    poly: Union[_Polygon, "np.ndarray"], n: int, idx: int, holes: List[Union[_Polygon, "np.ndarray"]] = None
+) -> List[Union[List[_Segment], "np.ndarray"]]:
+    """Divede a simple polygon, convex or not and possibly with holes, with lines parallel with its idx-th edge.
+
+    Parts have equal net area, holes excluded. They are ordered along the normal of the idx-th edge
+    pointing inside the polygon. As a line can cross a non-convex polygon or its holes several times,
+    each cut is made of one or more dividing segments. Runs in O(V log V) plus the length of the cuts.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise simple polygon, a list of points or an (N, 2) array.
+        n (int): number of parts to divide polygon into.
+        idx (int): index of edge of `poly` to be paralleled with.
+        holes (List[Union[_Polygon, np.ndarray]], optional): rings of the holes of the polygon,
+            in any orientation. Defaults to None.
+
+    Returns:
+        List[Union[List[_Segment], np.ndarray]]: dividing segments (bottom, top) of each of the n-1 cuts,
+            (M, 2, 2) arrays if `poly` is an array.
+    """
+    theta = _edge_angle(poly, idx)
+    as_array = _is_ndarray(poly)
+    rings = []
+    for ring in [poly] + list(holes or ()):
+        p = _rotated(ring, theta)
+        rings.append(p.tolist() if _is_ndarray(p) else [(q.x, q.y) for q in p])
+
+    res = []
+    for cut in _divide_rings(rings, n):
+        lines = [(Point(x, bott), Point(x, top)) for x, bott, top in cut]
+        _rotate_back(lines, theta)
+        if as_array:
+            import numpy as np
+
+            lines = np.array([[[bott.x, bott.y], [top.x, top.y]] for bott, top in lines], dtype=float).reshape(-1, 2, 2)
+        res.append(lines)
+    return res
+
+
+class PreparedPolygon:
+    """Convex polygon prepared for repeated divisions with lines parallel with its idx-th edge.
+
+    Rotation, sweep and cumulative areas are computed once, then every cut is found in O(log V).
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        idx (int): index of edge to be paralleled with.
+
+    Attributes:
+        area (float): area of the polygon.
+    """
+
+    def __init__(self, poly: Union[_Polygon, "np.ndarray"], idx: int):
+        self._as_array = _is_ndarray(poly)
+        self._theta = _edge_angle(poly, idx)
+        p = _rotated(poly, self._theta)
+        if self._as_array:
+            p = [Point(x, y) for x, y in p.tolist()]
+        p = p[idx:] + p[:idx]
+        self._bounds = [(p[0], p[-1])] + _dividing_polygon_segs(p)
+        self._cum_areas = _prefix_areas(self._bounds)
+        self.area = _polygon_area(p)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the prepared polygon, in bytes."""
+        float_size = sys.getsizeof(0.0)
+        point_size = sys.getsizeof(self._bounds[0][0]) + 2 * float_size
+        seg_size = sys.getsizeof(self._bounds[0]) + 2 * point_size
+        return (
+            sys.getsizeof(self._bounds)
+            + len(self._bounds) * seg_size
+            + sys.getsizeof(self._cum_areas)
+            + len(self._cum_areas) * float_size
+        )
+
+    def _result(self, lines: List[_Segment]) -> Union[List[_Segment], "np.ndarray"]:
+        """Convert dividing segments to origin coord, as an array if the polygon was an array."""
+        _rotate_back(lines, self._theta)
+        if self._as_array:
+            import numpy as np
+
+            return np.array([[[bott.x, bott.y], [top.x, top.y]] for bott, top in lines], dtype=float).reshape(-1, 2, 2)
+        return lines
+
+    def _check_areas(self, low: float, high: float) -> None:
+        """Raise ValueError if desired areas between `low` and `high` are out of [0, area], beyond rounding."""
+        if low < 0.0 or high > self.area * (1.0 + 1e-9):
+            area = low if low < 0.0 else high
+            raise ValueError(f"areas must be between 0 and the polygon area {self.area}, got {area}")
+
+    def cut_at_area(self, area: float) -> Union[_Segment, "np.ndarray"]:
+        """Get the dividing segment which separates the part of the specified area next to the idx-th edge.
+
+        Args:
+            area (float): desired area, between 0 and the area of the polygon
+
+        Returns:
+            Union[_Segment, np.ndarray]: dividing segment (bottom, top), a (2, 2) array if the polygon was an array
+
+        Raises:
+            ValueError: if `area` is out of [0, area of the polygon]
+        """
+        self._check_areas(area, area)
+        return self._result([_cut_at_area(self._bounds, self._cum_areas, area)])[0]
+
+    def cut_at_fraction(self, fraction: float) -> Union[_Segment, "np.ndarray"]:
+        """Get the dividing segment which separates the specified fraction of area next to the idx-th edge.
+
+        Args:
+            fraction (float): desired fraction of area, between 0 and 1
+
+        Returns:
+            Union[_Segment, np.ndarray]: dividing segment (bottom, top), a (2, 2) array if the polygon was an array
+
+        Raises:
+            ValueError: if `fraction` is out of [0, 1]
+        """
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError(f"fraction must be between 0 and 1, got {fraction}")
+        return self.cut_at_area(fraction * self.area)
+
+    def cut_at_areas(self, areas: List[float]) -> Union[List[_Segment], "np.ndarray"]:
+        """Get the dividing segments which separate parts of the specified areas next to the idx-th edge.
+
+        All cuts are found in a single walk over the trapezoids, in O(V + k) for k areas.
+
+        Args:
+            areas (List[float]): desired areas on the idx-th edge side of each cut, in ascending order
+
+        Returns:
+            Union[List[_Segment], np.ndarray]: dividing segments, a (k, 2, 2) array if the polygon was an array
+
+        Raises:
+            ValueError: if an area is out of [0, area of the polygon]
+        """
+        if len(areas):
+            self._check_areas(min(areas), max(areas))
+        return self._result(_cuts_at_areas(self._bounds, self._cum_areas, areas))
+
+    def divide(self, n: int) -> Union[List[_Segment], "np.ndarray"]:
+        """Divide polygon into `n` parts of equal area.
+
+        Args:
+            n (int): number of parts to divide polygon into.
+
+        Returns:
+            Union[List[_Segment], np.ndarray]: dividing segments, an (n-1, 2, 2) array if the polygon was an array
+        """
+        des_area = self.area / n
+        return self._result([_cut_at_area(self._bounds, self._cum_areas, des_area * k) for k in range(1, n)])
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a `PreparedPolygonCache`."""
+
+    hits: int
+    misses: int
+    evictions: int
+    currsize: int
+    nbytes: int
+    maxbytes: int
+
+
+class PreparedPolygonCache:
+    """Thread-safe LRU cache of prepared polygons, keyed by a hash of the vertex coordinates and `idx`.
+
+    Args:
+        maxbytes (int, optional): memory budget of the prepared polygons, least recently used ones being
+            evicted beyond it. Defaults to 64 MiB.
+    """
+
+    def __init__(self, maxbytes: int = 64 << 20):
+        self.maxbytes = maxbytes
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # key -> PreparedPolygon
+        self._nbytes = 0
+        self._hits = self._misses = self._evictions = 0
+
+    @staticmethod
+    def _key(poly: Union[_Polygon, "np.ndarray"], idx: int) -> bytes:
+        """Canonical hash of the polygon, the index of its edge and whether it is an array."""
+        import hashlib
+        from array import array
+
+        if _is_ndarray(poly):
+            import numpy as np
+
+            kind, coords = b"a", np.ascontiguousarray(poly, dtype=float).tobytes()
+        else:
+            kind, coords = b"p", array("d", [c for q in poly for c in q]).tobytes()
+        h = hashlib.blake2b(coords, digest_size=16)
+        h.update(kind + (idx % len(poly)).to_bytes(8, "little"))
+        return h.digest()
+
+    def get(self, poly: Union[_Polygon, "np.ndarray"], idx: int) -> PreparedPolygon:
+        """Get the prepared polygon, preparing it on a miss.
+
+        Args:
+            poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+            idx (int): index of edge to be paralleled with.
+
+        Returns:
+            PreparedPolygon: prepared polygon
+        """
+        key = self._key(poly, idx)
+        with self._lock:
+            prepared = self._cache.get(key)
+            if prepared is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return prepared
+            self._misses += 1
+
+        prepared = PreparedPolygon(poly, idx)
+        nbytes = prepared.nbytes
+        with self._lock:
+            if key not in self._cache and nbytes <= self.maxbytes:
+                self._cache[key] = prepared
+                self._nbytes += nbytes
+                while self._nbytes > self.maxbytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._nbytes -= evicted.nbytes
+                    self._evictions += 1
+        return prepared
+
+    def divide(self, poly: Union[_Polygon, "np.ndarray"], n: int, idx: int) -> Union[List[_Segment], "np.ndarray"]:
+        """Cached `divide_polygon`: divide polygon with lines parallel with its idx-th edge.
+
+        Args:
+            poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+            n (int): number of parts to divide polygon into.
+            idx (int): index of edge to be paralleled with.
+
+        Returns:
+            Union[List[_Segment], np.ndarray]: dividing segments, an (n-1, 2, 2) array if `poly` is an array.
+        """
+        return self.get(poly, idx).divide(n)
+
+    def cache_info(self) -> CacheInfo:
+        """Get hit/miss statistics and memory usage of the cache."""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._evictions, len(self._cache), self._nbytes, self.maxbytes
+            )
+
+    def clear(self) -> None:
+        """Remove all prepared polygons and reset statistics."""
+        with self._lock:
+            self._cache.clear()
+            self._nbytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+
+def divide_polygon_by_fractions(
+    poly: Union[_Polygon, "np.ndarray"], fractions: List[float], idx: int
+) -> Union[List[_Segment], "np.ndarray"]:
+    """Divede polygon into parts of the specified fractions of its area, with lines parallel with its idx-th edge.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        fractions (List[float]): shares of area of the parts from the idx-th edge on, normalized by their sum.
+        idx (int): index of edge to be paralleled with.
+
+    Returns:
+        Union[List[_Segment], np.ndarray]: len(fractions)-1 dividing segments, an array if `poly` is an array.
+
+    Raises:
+        ValueError: if a fraction is negative, or they sum to 0.
+    """
+    if any(f < 0.0 for f in fractions):
+        raise ValueError("fractions must not be negative")
+    total = sum(fractions)
+    if not total > 0.0:
+        raise ValueError("fractions must have a positive sum")
+    prepared = PreparedPolygon(poly, idx)
+    scale = prepared.area / total
+    return prepared.cut_at_areas([a * scale for a in accumulate(fractions[:-1])])
+
+
+def divide_polygon_by_areas(
+    poly: Union[_Polygon, "np.ndarray"], areas: List[float], idx: int
+) -> Union[List[_Segment], "np.ndarray"]:
+    """Divede polygon into parts of the specified areas, with lines parallel with its idx-th edge.
+
+    The remaining area, if any, forms the last part.
+
+    Args:
+        poly (Union[_Polygon, np.ndarray]): counterclockwise convex polygon, a list of points or an (N, 2) array.
+        areas (List[float]): areas of the parts from the idx-th edge on.
+        idx (int): index of edge to be paralleled with.
+
+    Returns:
+        Union[List[_Segment], np.ndarray]: len(areas) dividing segments, an array if `poly` is an array.
+    """
+    if any(a < 0.0 for a in areas):
+        raise ValueError("areas must not be negative")
+    prepared = PreparedPolygon(poly, idx)
+    cum_areas = list(accumulate(areas))
+    if cum_areas and cum_areas[-1] > prepared.area * (1.0 + 1e-9):
+        raise ValueError(f"total area {cum_areas[-1]} exceeds polygon area {prepared.area}")
+    return prepared.cut_at_areas(cum_areas)
+
+
+class StageStats:
+    """Wall time and number of calls of a stage of `divide_polygon`."""
+
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"StageStats(calls={self.calls}, seconds={self.seconds:.6f})"
+
+
+# stages of `divide_polygon`, and the functions they are made of
+_STAGES = {
+    "rotation": ("_rotated", "_rotate_coord"),
+    "sweep": ("_dividing_polygon_segs", "_dividing_polygon_segs_array", "_dividing_chains_segs_array"),
+    "area": ("_polygon_area", "_prefix_areas"),
+    "cut": ("_cut_at_area", "_sep_trapezoids"),
+    "back-rotation": ("_rotate_back",),
+    # compiled backends run all the stages above in one call, which cannot be split
+    "compiled": ("_divide_compiled", "_divide_numba"),
+}
+_profiling = False
+
+
+@contextmanager
+def profile_stages(callback=None) -> Iterator[Dict[str, StageStats]]:
+    """Measure wall time and number of calls of each stage of `divide_polygon` (and the other entry points).
+
+    Stages are "rotation", "sweep", "area", "cut" and "back-rotation", and "compiled" for whole divisions
+    by the "compiled" and "numba" backends, whose stages run in compiled code. The functions making them are
+    only wrapped with timers inside the context, so there is no overhead at all outside of it. A call
+    nested inside another stage (in the same thread) is counted in the outer stage only. Calls from all threads
+    are added up, so that stages may take longer than wall time, and calls made in worker processes are not
+    measured.
+
+    Args:
+        callback (Callable[[Dict[str, StageStats]], None], optional): called with the statistics on exit.
+
+    Yields:
+        Dict[str, StageStats]: statistics of each stage, updated as calls are made.
+    """
+    global _profiling
+    from time import perf_counter
+
+    if _profiling:
+        raise RuntimeError("profile_stages() is already active")
+    module = sys.modules[__name__]
+    stats = {stage: StageStats() for stage in _STAGES}
+    nesting = threading.local()  # depth of calls of stages in each thread
+    lock = threading.Lock()
+
+    def timed(func, stage_stats: StageStats):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(nesting, "depth", 0):
+                return func(*args, **kwargs)
+            nesting.depth = 1
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = perf_counter() - start
+                nesting.depth = 0
+                with lock:
+                    stage_stats.seconds += seconds
+                    stage_stats.calls += 1
+
+        return wrapper
+
+    originals = {name: getattr(module, name) for names in _STAGES.values() for name in names}
+    backends = dict(_BACKENDS)
+    _profiling = True
+    try:
+        for stage, names in _STAGES.items():
+            for name in names:
+                setattr(module, name, timed(originals[name], stats[stage]))
+        # backends are dispatched through the registry, not module attributes
+        wrapped = {func: getattr(module, name) for name, func in originals.items()}
+        for name, func in backends.items():
+            _BACKENDS[name] = wrapped.get(func, func)
+        yield stats
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+        _BACKENDS.update(backends)
+        _profiling = False
+    if callback is not None:
+        callback(stats)
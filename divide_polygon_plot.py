@@ -0,0 +1,75 @@
+"""
+Description  : Plotting of divide_polygon, for debugging
+
+Requires matplotlib. Kept apart from `divide_polygon` so that importing it stays cheap.
+Run `python divide_polygon_plot.py` to draw the pictures of README.md into images/.
+"""
+
+import os
+
+from divide_polygon import Point, _Polygon, divide_polygon
+
+
+def draw_polygon(p: _Polygon, lines=None, title="") -> None:
+    """Plot a polygon and its dividing segments, saved to file `title` if given, shown otherwise."""
+    import matplotlib.pyplot as plt
+
+    coord = [(_p.x, _p.y) for _p in p]
+    coord.append(coord[0])
+    xs, ys = zip(*coord)
+    plt.figure()
+    plt.axis("square")
+    plt.xlim(min(p, key=lambda p: p.x).x - 1, max(p, key=lambda p: p.x).x + 1)
+    plt.ylim(min(p, key=lambda p: p.y).y - 1, max(p, key=lambda p: p.y).y + 1)
+    plt.grid(color="r", linestyle="--", linewidth=1, alpha=0.3)
+    plt.plot(xs, ys)
+    if lines:
+        for line in lines:
+            plt.plot([p.x for p in line], [p.y for p in line])
+    if title:
+        plt.savefig(title)
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    # poly = [Point(3, 3), Point(8, 3), Point(8, 6), Point(3, 6)]
+    # poly = [
+    #     Point(-1, 0),
+    #     Point(0.5, -1),
+    #     Point(1.5, -1.5),
+    #     Point(2.5, -1.5),
+    #     Point(3.5, -1),
+    #     Point(3.5, 3),
+    #     Point(2.5, 3.5),
+    #     Point(1, 3),
+    #     Point(-0.5, 1),
+    # ]
+    poly = [
+        Point(1, 6),
+        Point(4, 2),
+        Point(8, 3),
+        Point(10, 5),
+        Point(7, 9),
+        Point(5, 9),
+    ]
+
+    # print(_sep_polygon_lines(p1))
+
+    # print(_eval_polygon_area([Point(0, 1), Point(2, 3), Point(4, 7)]))
+
+    # print(
+    #     _sep_trapeziod_area(
+    #         [Point(0.0, 0.0), Point(0.0, 1.0)],
+    #         [Point(1.0, 0.00), Point(1.0, 1.00)],
+    #         0.5,
+    #     )
+    # )
+    # for i in range(2, 10):
+    #     print(_divide_polygon(p1, i))
+
+    print(f"polygon: {poly}")
+    for i in range(2, 6):
+        lines = divide_polygon(poly, i, 2)
+        print(f"when n={i}, result: {lines}")
+        draw_polygon(poly, lines, os.path.join("images", f"divide_{i}.png"))
@@ -0,0 +1,728 @@
+"""
+Description  : Tests of divide_polygon
+
+Run with `python -m unittest` (or pytest). Array tests are skipped if numpy is not installed.
+"""
+
+import importlib.util
+import os
+import random
+import unittest
+from itertools import product
+from math import cos, hypot, pi, sin
+
+import divide_polygon as dp
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_SHAPELY = importlib.util.find_spec("shapely") is not None
+
+# unit square, each side split in two: edges have collinear neighbours
+SPLIT_SQUARE = [(0, 0), (0.5, 0), (1, 0), (1, 0.5), (1, 1), (0.5, 1), (0, 1), (0, 0.5)]
+
+
+def densified_square(m: int):
+    """Counterclockwise unit square with `m` vertices on each side."""
+    side = [i / m for i in range(m)]
+    bottom, right = [(t, 0.0) for t in side], [(1.0, t) for t in side]
+    return bottom + right + [(1.0 - t, 1.0) for t in side] + [(0.0, 1.0 - t) for t in side]
+
+
+def rectangle(width: float, height: float, m: int):
+    """Counterclockwise rectangle with `m` vertices on each side."""
+    side = [i / m for i in range(m)]
+    return (
+        [(width * t, 0.0) for t in side]
+        + [(width, height * t) for t in side]
+        + [(width * (1.0 - t), height) for t in side]
+        + [(0.0, height * (1.0 - t)) for t in side]
+    )
+
+
+def random_convex(rng: random.Random, m: int):
+    """Counterclockwise convex polygon of `m` vertices on an ellipse, at random angles."""
+    angles = sorted(rng.uniform(0.0, 2.0 * pi) for _ in range(m))
+    a, b, cx, cy = rng.uniform(1.0, 5.0), rng.uniform(1.0, 5.0), rng.uniform(-10.0, 10.0), rng.uniform(-10.0, 10.0)
+    return [(cx + a * cos(t), cy + b * sin(t)) for t in angles]
+
+
+def cut_positions(lines, poly, idx):
+    """Positions of cuts parallel with the idx-th edge of an axis-aligned polygon, along its normal."""
+    axis = 1 if poly[idx - 1][1] == poly[idx][1] else 0
+    return sorted(round(bott[axis], 9) for bott, _ in as_tuples(lines))
+
+
+def area(coords):
+    """Unsigned shoelace area of a ring."""
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(coords, coords[1:] + coords[:1]))) / 2.0
+
+
+def clipped_area(coords, line, keep):
+    """Area of the part of a polygon on the same side of the line through `line` as the point `keep`."""
+    (x0, y0), (x1, y1) = line
+
+    def side(q):
+        return (x1 - x0) * (q[1] - y0) - (y1 - y0) * (q[0] - x0)
+
+    sign = 1.0 if side(keep) > 0.0 else -1.0
+    res = []
+    for q, r in zip(coords, coords[1:] + coords[:1]):
+        sq, sr = sign * side(q), sign * side(r)
+        if sq >= 0.0:
+            res.append(q)
+        if sq * sr < 0.0:
+            t = sq / (sq - sr)
+            res.append((q[0] + t * (r[0] - q[0]), q[1] + t * (r[1] - q[1])))
+    return area(res) if res else 0.0
+
+
+def inside(coords, q):
+    """Whether a point is inside a ring, by the even-odd rule."""
+    res = False
+    for (x0, y0), (x1, y1) in zip(coords, coords[1:] + coords[:1]):
+        if (y0 > q[1]) != (y1 > q[1]) and q[0] < x0 + (x1 - x0) * (q[1] - y0) / (y1 - y0):
+            res = not res
+    return res
+
+
+def as_points(coords):
+    return [dp.Point(x, y) for x, y in coords]
+
+
+def as_tuples(lines):
+    """Dividing segments as nested tuples, from points or an array."""
+    return [(tuple(map(float, bott)), tuple(map(float, top))) for bott, top in lines]
+
+
+class TestCase(unittest.TestCase):
+    def assertLinesAlmostEqual(self, lines, expected, places=9):
+        lines, expected = as_tuples(lines), as_tuples(expected)
+        self.assertEqual(len(lines), len(expected))
+        for line, other in zip(lines, expected):
+            for point, other_point in zip(line, other):
+                for a, b in zip(point, other_point):
+                    self.assertAlmostEqual(a, b, places=places)
+
+
+class TestCollinearVertices(TestCase):
+    def test_split_square(self):
+        for idx in range(len(SPLIT_SQUARE)):
+            lines = dp.divide_polygon(as_points(SPLIT_SQUARE), 4, idx)
+            self.assertEqual(cut_positions(lines, SPLIT_SQUARE, idx), [0.25, 0.5, 0.75])
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_densified_square_array(self):
+        import numpy as np
+
+        coords = densified_square(100)
+        for backend in dp.available_backends():
+            for idx in (0, 1, 100, 150, 399):
+                lines = dp.divide_polygon(np.array(coords), 4, idx, backend=backend)
+                self.assertEqual(cut_positions(lines, coords, idx), [0.25, 0.5, 0.75], backend)
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_split_square_array(self):
+        import numpy as np
+
+        for idx in range(len(SPLIT_SQUARE)):
+            expected = dp.divide_polygon(as_points(SPLIT_SQUARE), 4, idx, backend="python")
+            self.assertLinesAlmostEqual(dp.divide_polygon(np.array(SPLIT_SQUARE), 4, idx, backend="numpy"), expected)
+            poly = np.array(SPLIT_SQUARE, dtype=float)
+            self.assertLinesAlmostEqual(dp.divide_polygon(poly, 4, idx, in_place=True), expected)
+
+    def test_densified_square(self):
+        coords = densified_square(100)
+        for idx in (0, 1, 100, 150, 399):
+            lines = dp.divide_polygon(as_points(coords), 4, idx)
+            self.assertEqual(cut_positions(lines, coords, idx), [0.25, 0.5, 0.75])
+
+    def test_sweep_stops_at_rightmost_vertex(self):
+        # crossings past the rightmost vertex are not extrapolated, so the sweep has to stop on indices
+        coords = [
+            (13.095876912037955, 3.717740856962651),
+            (6.080182375039831, 4.506742460835591),
+            (4.651565338037443, 3.978970558451463),
+            (12.818626974335025, 2.423968885974023),
+            (12.999766840375315, 2.554545427087933),
+        ]
+        (x_prev, y_prev), (x_cur, y_cur) = coords[3], coords[4]
+        keep = ((x_prev + x_cur) / 2.0, (y_prev + y_cur) / 2.0)
+        for backend in dp.available_backends():
+            lines = as_tuples(dp.divide_polygon(as_points(coords), 3, 4, backend=backend))
+            self.assertEqual(len(lines), 2, backend)
+            for k, line in enumerate(lines, 1):
+                self.assertAlmostEqual(clipped_area(coords, line, keep), area(coords) * k / 3, places=9, msg=backend)
+
+    def test_split_rectangles(self):
+        # rounding leaves a corner of the far side strictly rightmost, in line with the other vertices of the side
+        for width, height in ((3.0, 1.0), (1.0, 3.0), (1.5, 1.0)):
+            for m in (1, 2, 3):
+                coords = rectangle(width, height, m)
+                polys = [as_points(coords)]
+                if HAS_NUMPY:
+                    import numpy as np
+
+                    polys.append(np.array(coords))
+                for backend, idx, n, poly in product(dp.available_backends(), range(len(coords)), (10, 37, 200), polys):
+                    lines = as_tuples(dp.divide_polygon(poly, n, idx, backend=backend))
+                    axis = 1 if coords[idx - 1][1] == coords[idx][1] else 0
+                    extent = (height, width)[axis]
+                    expected = [round((width, height)[axis] * k / n, 9) for k in range(1, n)]
+                    msg = (width, height, m, backend, idx, n)
+                    self.assertEqual(cut_positions(lines, coords, idx), expected, msg)
+                    for bott, top in lines:
+                        self.assertAlmostEqual(abs(top[1 - axis] - bott[1 - axis]), extent, places=9, msg=msg)
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_split_rectangles_batch(self):
+        import numpy as np
+
+        cases = [
+            (rectangle(width, height, m), idx, n)
+            for width, height in ((3.0, 1.0), (1.0, 3.0), (1.5, 1.0), (4.0, 1.0))
+            for m in (1, 2, 3)
+            for idx in range(4 * m)
+            for n in (10, 37)
+        ]
+        coords = np.concatenate([np.array(case[0]) for case in cases])
+        offsets = np.cumsum([0] + [len(case[0]) for case in cases])
+        ns, idxs = [case[2] for case in cases], [case[1] for case in cases]
+        segs, seg_offsets = dp.divide_polygons_batch(coords, offsets, ns, idxs)
+        for i, (rect, idx, n) in enumerate(cases):
+            lines = segs[seg_offsets[i] : seg_offsets[i + 1]]
+            self.assertLinesAlmostEqual(lines, dp.divide_polygon(as_points(rect), n, idx, backend="python"))
+
+    def test_whole_side_in_line(self):
+        # rotating the edge onto the y axis scatters the x of the other vertices of its side by rounding
+        coords = densified_square(20)
+        for backend in dp.available_backends():
+            for idx in range(len(coords)):
+                lines = dp.divide_polygon(as_points(coords), 5, idx, backend=backend)
+                self.assertEqual(cut_positions(lines, coords, idx), [0.2, 0.4, 0.6, 0.8], (backend, idx))
+
+
+class TestConvexChains(unittest.TestCase):
+    def test_runs_of_extreme_vertices(self):
+        # left and right sides are perpendicular to the direction: chains run between their ends
+        coords = densified_square(10)
+        polys = [as_points(coords)]
+        if HAS_NUMPY:
+            import numpy as np
+
+            polys.append(np.array(coords))
+        for poly in polys:
+            lower, upper = dp.convex_chains(poly, (1, 0))
+            self.assertEqual((lower.start, upper.start), (0, 30))
+            self.assertEqual((len(lower), len(upper)), (11, 11))
+
+
+class TestDivideAlong(TestCase):
+    def test_along_edges(self):
+        for coords in (SPLIT_SQUARE, densified_square(5), [(0, 0), (2, 0), (3, 1), (1, 2)]):
+            polys = [as_points(coords)]
+            if HAS_NUMPY:
+                import numpy as np
+
+                polys.append(np.array(coords, dtype=float))
+            for poly in polys:
+                for idx in range(len(coords)):
+                    (x_prev, y_prev), (x_cur, y_cur) = coords[idx - 1], coords[idx]
+                    lines = dp.divide_polygon_along(poly, 3, (x_prev - x_cur, y_prev - y_cur))
+                    self.assertLinesAlmostEqual(lines, dp.divide_polygon(as_points(coords), 3, idx, backend="python"))
+
+
+class TestParity(TestCase):
+    """Every backend and entry point against the python backend."""
+
+    def setUp(self):
+        rng = random.Random(17)
+        self.polys = [random_convex(rng, m) for m in (3, 4, 7, 50, 300)] + [
+            SPLIT_SQUARE,
+            densified_square(10),
+            [(0, 0), (2, 0), (3, 1), (3, 2), (2, 3), (0, 3)],  # vertical edges
+            [(0, 0), (4, 0), (4, 1), (1, 3)],
+        ]
+
+    def cases(self):
+        for coords in self.polys:
+            for idx in sorted({0, 1, len(coords) // 2, len(coords) - 1}):
+                for n in (1, 2, 5):
+                    yield coords, idx, n, dp.divide_polygon(as_points(coords), n, idx, backend="python")
+
+    def inputs(self, coords):
+        yield as_points(coords)
+        if HAS_NUMPY:
+            import numpy as np
+
+            yield np.array(coords, dtype=float)
+
+    def test_backends(self):
+        for backend in dp.available_backends():
+            for coords, idx, n, expected in self.cases():
+                for poly in self.inputs(coords):
+                    with self.subTest(backend=backend, m=len(coords), idx=idx, n=n, array=not isinstance(poly, list)):
+                        self.assertLinesAlmostEqual(dp.divide_polygon(poly, n, idx, backend=backend), expected)
+
+    def test_prepared_polygon(self):
+        for coords, idx, n, expected in self.cases():
+            for poly in self.inputs(coords):
+                self.assertLinesAlmostEqual(dp.PreparedPolygon(poly, idx).divide(n), expected)
+
+    def test_iter_divide_polygon(self):
+        for coords, idx, n, expected in self.cases():
+            for poly in self.inputs(coords):
+                self.assertLinesAlmostEqual(list(dp.iter_divide_polygon(poly, n, idx)), expected)
+
+    def test_divide_polygon_along(self):
+        for coords, idx, n, expected in self.cases():
+            (x_prev, y_prev), (x_cur, y_cur) = coords[idx - 1], coords[idx]
+            direction = (x_prev - x_cur, y_prev - y_cur)
+            for poly in self.inputs(coords):
+                self.assertLinesAlmostEqual(dp.divide_polygon_along(poly, n, direction), expected)
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_batch(self):
+        import numpy as np
+
+        cases = list(self.cases())
+        coords = np.concatenate([np.array(case[0], dtype=float) for case in cases])
+        offsets = np.cumsum([0] + [len(case[0]) for case in cases])
+        segs, seg_offsets = dp.divide_polygons_batch(
+            coords, offsets, [case[2] for case in cases], [case[1] for case in cases]
+        )
+        for i, (_, _, _, expected) in enumerate(cases):
+            self.assertLinesAlmostEqual(segs[seg_offsets[i] : seg_offsets[i + 1]], expected)
+
+
+class TestDirection(TestCase):
+    def test_angles_and_vectors(self):
+        poly = as_points(SPLIT_SQUARE)
+        expected = dp.divide_polygon_along(poly, 3, (1.0, 1.0))
+        directions = [pi / 4, (2, 2)]
+        if HAS_NUMPY:
+            import numpy as np
+
+            directions += [np.float64(pi / 4), np.float32(pi / 4), np.array([1.0, 1.0])]
+        for direction in directions:
+            self.assertLinesAlmostEqual(dp.divide_polygon_along(poly, 3, direction), expected, places=6)
+        lower, upper = dp.convex_chains(poly, 0)  # integer angle
+        self.assertEqual((lower.start, upper.start), (0, 6))
+        with self.assertRaises(ValueError):
+            dp.divide_polygon_along(poly, 3, (0, 0))
+
+
+class TestAutoBackend(TestCase):
+    def test_matches_python_across_thresholds(self):
+        for m in (2, 10, 100):  # 8 to 400 vertices, on both sides of AUTO_THRESHOLDS
+            coords = densified_square(m)
+            for n in (2, 4, 200):
+                for idx in (0, 1, m):
+                    expected = dp.divide_polygon(as_points(coords), n, idx, backend="python")
+                    lines = dp.divide_polygon(as_points(coords), n, idx, backend="auto")
+                    self.assertTrue(all(isinstance(point, dp.Point) for line in lines for point in line))
+                    self.assertLinesAlmostEqual(lines, expected)
+
+    def test_default_is_auto(self):
+        with dp.use_backend("auto"):
+            coords = densified_square(100)
+            lines = dp.divide_polygon(as_points(coords), 4, 100)
+            self.assertEqual(cut_positions(lines, coords, 100), [0.25, 0.5, 0.75])
+
+
+class TestAllOrientations(TestCase):
+    def check(self, coords, n):
+        polys = [as_points(coords)]
+        if HAS_NUMPY:
+            import numpy as np
+
+            polys.append(np.array(coords, dtype=float))
+        for poly in polys:
+            res = dp.divide_all_orientations(poly, n)
+            self.assertEqual(sorted(res), list(range(len(coords))))
+            for idx, lines in res.items():
+                self.assertLinesAlmostEqual(lines, dp.divide_polygon(as_points(coords), n, idx, backend="python"))
+
+    def test_small(self):
+        self.check([(0, 0), (1, 0), (0, 1)], 3)
+        self.check(SPLIT_SQUARE, 4)
+
+    def test_large(self):
+        self.check(densified_square(20), 5)  # 80 vertices: searched at once for points too
+        self.check(densified_square(20), 1)
+
+
+class TestPreparedPolygon(unittest.TestCase):
+    def test_out_of_range(self):
+        prepared = dp.PreparedPolygon(as_points(SPLIT_SQUARE), 0)
+        for fraction in (-0.1, 1.5):
+            with self.assertRaises(ValueError):
+                prepared.cut_at_fraction(fraction)
+            with self.assertRaises(ValueError):
+                prepared.cut_at_area(fraction * prepared.area)
+            with self.assertRaises(ValueError):
+                prepared.cut_at_areas([0.5, fraction])
+        # cuts parallel with the left side
+        self.assertEqual(cut_positions([prepared.cut_at_fraction(1.0)], SPLIT_SQUARE, 0), [1.0])
+        self.assertEqual(cut_positions([prepared.cut_at_area(0.0)], SPLIT_SQUARE, 0), [0.0])
+
+
+class TestPreparedPolygonCache(TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.coords = [random_convex(rng, 12) for _ in range(3)]
+
+    def test_counters_and_key(self):
+        cache = dp.PreparedPolygonCache()
+        poly = as_points(self.coords[0])
+        prepared = cache.get(poly, 1)
+        # edges are keyed modulo the number of vertices, and equal coordinates hit whatever the point objects
+        self.assertIs(cache.get(poly, 1 + len(poly)), prepared)
+        self.assertIs(cache.get(as_points(self.coords[0]), 1 - len(poly)), prepared)
+        self.assertIsNot(cache.get(poly, 2), prepared)
+        self.assertEqual(cache.cache_info(), dp.CacheInfo(2, 2, 0, 2, cache.cache_info().nbytes, cache.maxbytes))
+        self.assertEqual(cache.cache_info().nbytes, prepared.nbytes + cache.get(poly, 2).nbytes)
+        cache.clear()
+        self.assertEqual(cache.cache_info(), dp.CacheInfo(0, 0, 0, 0, 0, cache.maxbytes))
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_arrays_keyed_apart(self):
+        import numpy as np
+
+        cache = dp.PreparedPolygonCache()
+        lines = cache.divide(as_points(self.coords[0]), 3, 0)
+        res = cache.divide(np.array(self.coords[0]), 3, 0)
+        self.assertIsInstance(res, np.ndarray)
+        self.assertLinesAlmostEqual(res, lines)
+        self.assertEqual(cache.cache_info().misses, 2)
+
+    def test_lru_eviction(self):
+        a, b, c = (as_points(coords) for coords in self.coords)
+        nbytes = dp.PreparedPolygon(a, 0).nbytes
+        cache = dp.PreparedPolygonCache(maxbytes=2 * nbytes)
+        cache.get(a, 0)
+        cache.get(b, 0)
+        cache.get(a, 0)  # b is now the least recently used
+        cache.get(c, 0)
+        info = cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.evictions, info.currsize), (1, 3, 1, 2))
+        self.assertLessEqual(info.nbytes, cache.maxbytes)
+        cache.get(a, 0)
+        cache.get(c, 0)
+        self.assertEqual(cache.cache_info().hits, 3)
+        cache.get(b, 0)
+        self.assertEqual(cache.cache_info().misses, 4)
+
+    def test_larger_than_budget(self):
+        cache = dp.PreparedPolygonCache(maxbytes=1)
+        poly = as_points(self.coords[0])
+        self.assertLinesAlmostEqual(cache.divide(poly, 4, 3), dp.divide_polygon(poly, 4, 3, backend="python"))
+        self.assertEqual(cache.cache_info().currsize, 0)
+
+    def test_fresh_points(self):
+        cache = dp.PreparedPolygonCache()
+        poly = as_points(self.coords[0])
+        expected = dp.divide_polygon(poly, 4, 3, backend="python")
+        for bott, top in cache.divide(poly, 4, 3):
+            bott.x = top.y = 1e9
+        self.assertLinesAlmostEqual(cache.divide(poly, 4, 3), expected)
+        self.assertEqual(cache.cache_info().hits, 1)
+
+
+class TestUnequalParts(unittest.TestCase):
+    def test_fractions(self):
+        lines = dp.divide_polygon_by_fractions(as_points(SPLIT_SQUARE), [1, 0, 2, 1], 0)
+        self.assertEqual(cut_positions(lines, SPLIT_SQUARE, 0), [0.25, 0.25, 0.75])
+
+    def test_invalid_fractions(self):
+        for fractions in ([], [0], [0, 0], [1, -1]):
+            with self.assertRaises(ValueError, msg=fractions):
+                dp.divide_polygon_by_fractions(as_points(SPLIT_SQUARE), fractions, 0)
+
+    def test_invalid_areas(self):
+        for areas in ([-0.5], [0.5, 0.6]):
+            with self.assertRaises(ValueError, msg=areas):
+                dp.divide_polygon_by_areas(as_points(SPLIT_SQUARE), areas, 0)
+        self.assertEqual(dp.divide_polygon_by_areas(as_points(SPLIT_SQUARE), [], 0), [])
+
+
+@unittest.skipUnless(HAS_NUMPY, "requires numpy")
+class TestFloat32(TestCase):
+    """Precision lost by float32 offsets from float64 origins (`local_frame`), for polygons in projected coordinates."""
+
+    N, IDX = 7, 1
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.polys = []
+        for _ in range(200):
+            x0, y0 = 4.5e6 + rng.uniform(-1e5, 1e5), 5.3e6 + rng.uniform(-1e5, 1e5)
+            coords = random_convex(rng, rng.randint(3, 200))
+            self.polys.append([(x0 + 400.0 * x, y0 + 400.0 * y) for x, y in coords])
+
+    def segment_error(self, lines, expected, coords):
+        """Check the largest distance between dividing segments, and get it relative to the extent."""
+        import numpy as np
+
+        # float32 rounds the direction of the edge to be paralleled with by up to 2**-24 of the extent over its
+        # length, which tilts cuts across the polygon
+        extent = float(np.ptp(np.array(coords), axis=0).max())
+        (x_prev, y_prev), (x_cur, y_cur) = coords[self.IDX - 1], coords[self.IDX]
+        bound = 2.0**-24 * extent * extent / hypot(x_cur - x_prev, y_cur - y_prev)
+        error = float(np.abs(np.array(as_tuples(lines)) - np.array(as_tuples(expected))).max(initial=0.0))
+        self.assertLessEqual(error, bound)
+        return error / extent
+
+    def test_batch(self):
+        import numpy as np
+
+        offsets = np.cumsum([0] + [len(coords) for coords in self.polys])
+        coords = np.concatenate([np.array(coords) for coords in self.polys])
+        local, origins = dp.local_frame(coords, offsets)
+        self.assertEqual(local.dtype, np.float32)
+
+        area_errors = [
+            abs(dp.polygon_area(local[a:b].astype(float)) / dp.polygon_area(coords[a:b]) - 1.0)
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+        self.assertLess(max(area_errors), 1e-6)
+
+        expected, seg_offsets = dp.divide_polygons_batch(coords, offsets, self.N, self.IDX)
+        segs, local_offsets = dp.divide_polygons_batch(local, offsets, self.N, self.IDX, origins=origins)
+        self.assertEqual(segs.dtype, np.float64)
+        np.testing.assert_array_equal(local_offsets, seg_offsets)
+        errors = [
+            self.segment_error(segs[a:b], expected[a:b], poly)
+            for a, b, poly in zip(seg_offsets[:-1], seg_offsets[1:], self.polys)
+        ]
+        self.assertLess(float(np.median(errors)), 1e-6)
+
+    def test_divide_polygon(self):
+        import numpy as np
+
+        for coords in self.polys[:20]:
+            local, origin = dp.local_frame(np.array(coords))
+            for backend in dp.available_backends():
+                expected = dp.divide_polygon(np.array(coords), self.N, self.IDX, backend=backend)
+                lines = dp.divide_polygon(local, self.N, self.IDX, backend=backend, origin=origin)
+                self.assertEqual(lines.dtype, np.float64)
+                self.assertLess(self.segment_error(lines, expected, coords), 1e-5)
+                points = dp.divide_polygon(as_points(local.tolist()), self.N, self.IDX, backend=backend, origin=origin)
+                self.segment_error(points, expected, coords)
+
+
+@unittest.skipUnless(HAS_SHAPELY, "requires shapely")
+class TestShapely(TestCase):
+    def setUp(self):
+        rng = random.Random(13)
+        self.coords = [random_convex(rng, m) for m in (3, 6, 25)]
+
+    def segments(self, geometry):
+        import shapely
+
+        self.assertIsInstance(geometry, shapely.MultiLineString)
+        return shapely.get_coordinates(geometry).reshape(-1, 2, 2)
+
+    def test_single(self):
+        import shapely
+
+        for coords in self.coords:
+            m = len(coords)
+            for idx in range(m):
+                expected = dp.divide_polygon(as_points(coords), 4, idx, backend="python")
+                self.assertLinesAlmostEqual(self.segments(dp.divide_polygon(shapely.Polygon(coords), 4, idx)), expected)
+                # edges of clockwise rings are indexed in their own order: the idx-th one is the (m-idx)-th reversed
+                res = dp.divide_polygon(shapely.Polygon(coords[::-1]), 4, (m - idx) % m)
+                self.assertLinesAlmostEqual(self.segments(res), expected)
+
+    def test_array(self):
+        import numpy as np
+        import shapely
+
+        polys = np.array([[shapely.Polygon(self.coords[0]), None], [shapely.Polygon(self.coords[2][::-1]), None]])
+        polys[0, 1] = shapely.Polygon(self.coords[1])
+        res = dp.divide_polygon(polys, np.array([[3, 2], [5, 1]]), 1)
+        self.assertEqual(res.shape, (2, 2))
+        self.assertIsNone(res[1, 1])
+        self.assertLinesAlmostEqual(self.segments(res[0, 0]), dp.divide_polygon(as_points(self.coords[0]), 3, 1))
+        self.assertLinesAlmostEqual(self.segments(res[0, 1]), dp.divide_polygon(as_points(self.coords[1]), 2, 1))
+        m = len(self.coords[2])
+        expected = dp.divide_polygon(as_points(self.coords[2]), 5, m - 1)
+        self.assertLinesAlmostEqual(self.segments(res[1, 0]), expected)
+
+    def test_interiors_as_holes(self):
+        import shapely
+
+        outer, hole = [(0, 0), (4, 0), (4, 4), (0, 4)], [(1, 1), (1, 3), (3, 3), (3, 1)]
+        expected = dp.divide_polygon(as_points(outer), 3, 1, holes=[as_points(hole)])
+        for poly in (shapely.Polygon(outer, [hole]), shapely.Polygon(outer[::-1], [hole[::-1]])):
+            idx = 1 if poly.exterior.is_ccw else 3
+            lines = as_tuples(self.segments(dp.divide_polygon(poly, 3, idx)))
+            self.assertLinesAlmostEqual(sorted(lines), sorted(as_tuples(expected)))
+
+    def test_not_polygons(self):
+        import shapely
+
+        with self.assertRaises(TypeError):
+            dp.divide_polygon(shapely.LineString([(0, 0), (1, 1)]), 2, 0)
+
+
+class TestParallel(TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        self.coords = [random_convex(rng, m) for m in (3, 5, 8, 13, 21, 34, 55)]
+
+    def inputs(self):
+        yield [as_points(coords) for coords in self.coords]
+        if HAS_NUMPY:
+            import numpy as np
+
+            yield [np.array(coords) for coords in self.coords]
+
+    def test_ordered(self):
+        for polys in self.inputs():
+            res = list(dp.divide_polygons_parallel(polys, 4, 1, workers=2, chunksize=2))
+            self.assertEqual(len(res), len(polys))
+            for lines, coords in zip(res, self.coords):
+                self.assertLinesAlmostEqual(lines, dp.divide_polygon(as_points(coords), 4, 1, backend="python"))
+
+    def test_unordered(self):
+        for polys in self.inputs():
+            res = dict(dp.divide_polygons_parallel(iter(polys), 4, 1, workers=2, chunksize=3, ordered=False))
+            self.assertEqual(sorted(res), list(range(len(polys))))
+            for i, coords in enumerate(self.coords):
+                self.assertLinesAlmostEqual(res[i], dp.divide_polygon(as_points(coords), 4, 1, backend="python"))
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "requires /dev/shm")
+    def test_close_early(self):
+        before = set(os.listdir("/dev/shm"))
+        polys = [as_points(coords) for coords in self.coords * 10]
+        gen = dp.divide_polygons_parallel(polys, 4, 1, workers=2, chunksize=1)
+        next(gen)
+        gen.close()
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())  # pending blocks are unlinked
+
+    def test_worker_exception(self):
+        # the error raised by the worker, not a BufferError from closing the shared memory under a view
+        with self.assertRaises(ZeroDivisionError):
+            list(dp.divide_polygons_parallel([as_points(coords) for coords in self.coords], 0, 1, workers=1))
+
+
+# L and U shapes, and a star: lines parallel with some of their edges cross them more than once
+L_SHAPE = [(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)]
+U_SHAPE = [(0, 0), (3, 0), (3, 2), (2, 2), (2, 1), (1, 1), (1, 2), (0, 2)]
+STAR = [(r * cos(pi / 2 + k * pi / 5), r * sin(pi / 2 + k * pi / 5)) for k, r in enumerate([1.0, 0.4] * 5)]
+
+
+class TestSimplePolygon(TestCase):
+    def check_cuts(self, cuts, rings, idx, n):
+        """Check that cuts lie inside the polygon and split it into parts of equal net area."""
+        outer, holes = rings[0], rings[1:]
+        net_area = area(outer) - sum(area(hole) for hole in holes)
+        # parts are ordered along the normal of the idx-th edge pointing inside, from the back of the polygon
+        (x_prev, y_prev), (x_cur, y_cur) = outer[idx - 1], outer[idx]
+        keep = ((x_prev + x_cur) / 2.0 + 1e3 * (y_cur - y_prev), (y_prev + y_cur) / 2.0 - 1e3 * (x_cur - x_prev))
+        self.assertEqual(len(cuts), n - 1)
+        for k, cut in enumerate(cuts, 1):
+            lines = as_tuples(cut)
+            self.assertTrue(lines)
+            for bott, top in lines:
+                middle = ((bott[0] + top[0]) / 2.0, (bott[1] + top[1]) / 2.0)
+                self.assertTrue(inside(outer, middle) and not any(inside(hole, middle) for hole in holes))
+            parts = [clipped_area(ring, lines[0], keep) for ring in rings]
+            self.assertAlmostEqual(parts[0] - sum(parts[1:]), net_area * k / n, places=9)
+
+    def inputs(self, coords):
+        yield as_points(coords)
+        if HAS_NUMPY:
+            import numpy as np
+
+            yield np.array(coords, dtype=float)
+
+    def test_net_areas(self):
+        for coords in (L_SHAPE, U_SHAPE, STAR, SPLIT_SQUARE):
+            for poly in self.inputs(coords):
+                for idx in range(len(coords)):
+                    for n in (2, 3, 4):  # cuts off the edges of the shapes, where they run along the boundary
+                        self.check_cuts(dp.divide_simple_polygon(poly, n, idx), [coords], idx, n)
+
+    def test_star(self):
+        for poly in self.inputs(STAR):
+            for idx in range(len(STAR)):
+                cuts = dp.divide_simple_polygon(poly, 7, idx)
+                self.check_cuts(cuts, [STAR], idx, 7)
+                self.assertEqual(max(len(cut) for cut in cuts), 2)  # across two points of the star
+
+    def test_holes(self):
+        outer = [(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0)]
+        ccw = [(1.0, 1.0), (3.0, 1.0), (3.0, 2.5), (1.0, 2.5)]
+        cw = [(2.0, 3.0), (1.5, 3.5), (2.5, 3.5)]
+        for holes in ([ccw], [cw], [ccw, cw]):
+            rings = [outer] + holes
+            for poly, hole_polys in zip(self.inputs(outer), zip(*(self.inputs(hole) for hole in holes))):
+                for idx in range(len(outer)):
+                    for n in (2, 3, 5):
+                        cuts = dp.divide_simple_polygon(poly, n, idx, holes=list(hole_polys))
+                        self.check_cuts(cuts, rings, idx, n)
+                        # divide_polygon flattens the cuts, into an array if the polygon is an array
+                        lines = dp.divide_polygon(poly, n, idx, holes=list(hole_polys))
+                        self.assertLinesAlmostEqual(lines, [line for cut in cuts for line in as_tuples(cut)])
+                        self.assertEqual(isinstance(lines, list), isinstance(poly, list))
+
+    def test_cut_across_hole(self):
+        # net area 12, halved at y = 2, across the hole
+        outer = as_points([(0, 0), (4, 0), (4, 4), (0, 4)])
+        for hole in ([(1, 1), (3, 1), (3, 3), (1, 3)], [(1, 1), (1, 3), (3, 3), (3, 1)]):
+            lines = as_tuples(dp.divide_polygon(outer, 2, 1, holes=[as_points(hole)]))
+            lines = sorted(tuple(sorted(line)) for line in lines)
+            self.assertLinesAlmostEqual(lines, [((0, 2), (1, 2)), ((3, 2), (4, 2))])
+
+    def test_cuts_crossing_twice(self):
+        # below y = 1, the U is 3 wide (area 3), above it two arms 1 wide: parts of 1.25 are cut at y = 5/12,
+        # 10/12, then 1.375 across both arms
+        for poly in self.inputs(U_SHAPE):
+            cuts = [as_tuples(cut) for cut in dp.divide_simple_polygon(poly, 4, 1)]
+            for cut, y, xs in zip(cuts, (5 / 12, 10 / 12, 1.375), ([(0, 3)], [(0, 3)], [(0, 1), (2, 3)])):
+                self.assertEqual(len(cut), len(xs))
+                for (bott, top), (x0, x1) in zip(sorted(cut, key=lambda line: min(line[0][0], line[1][0])), xs):
+                    self.assertAlmostEqual(bott[1], y)
+                    self.assertAlmostEqual(top[1], y)
+                    self.assertAlmostEqual(min(bott[0], top[0]), x0)
+                    self.assertAlmostEqual(max(bott[0], top[0]), x1)
+
+    def test_convex_matches_divide_polygon(self):
+        rng = random.Random(11)
+        for m in (3, 6, 40):
+            coords = random_convex(rng, m)
+            for idx in (0, m // 2):
+                cuts = dp.divide_simple_polygon(as_points(coords), 4, idx)
+                self.assertEqual([len(cut) for cut in cuts], [1, 1, 1])
+                expected = dp.divide_polygon(as_points(coords), 4, idx, backend="python")
+                self.assertLinesAlmostEqual([cut[0] for cut in cuts], expected)
+
+
+class TestProfileStages(unittest.TestCase):
+    def test_every_backend_is_measured(self):
+        hexagon = as_points([(1, 0), (0.5, 0.87), (-0.5, 0.87), (-1, 0), (-0.5, -0.87), (0.5, -0.87)])
+        for backend in dp.available_backends():
+            with dp.profile_stages() as stats:
+                dp.divide_polygon(hexagon, 5, 2, backend=backend)
+            if backend in ("compiled", "numba"):
+                self.assertEqual(stats["compiled"].calls, 1)
+            else:
+                self.assertEqual(stats["sweep"].calls, 1, backend)
+                self.assertEqual(stats["compiled"].calls, 0, backend)
+        self.assertEqual(dp._BACKENDS["python"], dp._divide_python)  # registry restored
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        poly = as_points(random_convex(random.Random(2), 50))
+        with dp.profile_stages() as stats:
+            with ThreadPoolExecutor(4) as executor:
+                # calls overlapping in other threads are timed too, not taken for nested calls
+                list(executor.map(lambda _: dp.divide_polygon(poly, 5, 2, backend="python"), range(400)))
+        self.assertEqual(stats["sweep"].calls, 400)
+        self.assertEqual(stats["rotation"].calls, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()